@@ -0,0 +1,218 @@
+import os, sys, json, time, platform, argparse, subprocess, tempfile
+# headless, unless a Qt platform is set
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+import numpy as np
+import pyqtgraph as pg
+from PyQt6 import QtCore, QtWidgets
+from detgeo_pyqt6 import MainWindow
+from detgeo_core import get_specs_lmt
+
+###########################################################
+# Benchmarks of the geometry and drawing hot paths
+# - runs headless (offscreen Qt platform) with settings.json
+# - every detector of the library at representative geometries
+# - results are written to json, compare with an older run:
+#   python detgeo_bench.py -o new.json --compare old.json
+###########################################################
+
+def get_geometries(lmt):
+    # representative geometries, the others are taken from settings.json
+    return {'default':    {},
+            'high_tilt':  {'tilt':lmt.tilt_max},
+            'large_yoff': {'yoff':lmt.yoff_max},
+            'small_dist': {'dist':lmt.dist_min},
+            'rotated':    {'rota':lmt.rota_max, 'yoff':lmt.yoff_max/2}}
+
+def time_call(fun, repeat, warmup=1):
+    # run fun() repeat times after warmup runs
+    # returns the timings [ms]
+    for _ in range(warmup):
+        fun()
+    _times = []
+    for _ in range(repeat):
+        _t0 = time.perf_counter()
+        fun()
+        _times.append((time.perf_counter() - _t0) * 1e3)
+    return _times
+
+def get_stats(times):
+    return {'median':float(np.median(times)), 'min':float(np.min(times)), 'mean':float(np.mean(times)),
+            'max':float(np.max(times)), 'n':len(times)}
+
+def get_meta(win):
+    # what the numbers depend on
+    meta = {'date':time.strftime('%Y-%m-%d %H:%M:%S'), 'python':platform.python_version(),
+            'platform':platform.platform(), 'cpus':os.cpu_count(), 'numpy':np.__version__,
+            'pyqtgraph':pg.__version__, 'qt':QtCore.QT_VERSION_STR,
+            'qpa':QtWidgets.QApplication.platformName()}
+    try:
+        meta['git'] = subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                     capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        meta['git'] = None
+    meta['plo'] = {_k:getattr(win.plo, _k) for _k in ('cont_engine', 'cont_reso_max', 'cont_conic_num', 'cont_conic_px',
+                                                       'cont_decimate', 'cont_cache_mb', 'cont_tth_num', 'cont_ref_num', 'render_budget', 'heat_map')}
+    return meta
+
+def get_view(win):
+    # visible detector area and screen pixel size, see MainWindow.get_job()
+    (_vx0, _vx1), (_vy0, _vy1) = win.ax.getViewBox().viewRange()
+    view = (max(_vx0, -win.plo.xdim), min(_vx1, win.plo.xdim), max(_vy0, -win.plo.ydim), min(_vy1, win.plo.ydim))
+    return view, win.ax.getViewBox().viewPixelSize()
+
+def get_ref_job(win, ref_names):
+    # job with all reference rings of the references ref_names
+    # the references of the window are restored
+    _drawn = win.geo.reference
+    win.geo.reference = ref_names
+    win.get_reference()
+    view, pixel = get_view(win)
+    ref_ttr, ref_item = win.get_ref_ttr(win.geo.ener, win.geo.dist)
+    job = win.engine.get_job(win.geo, ref_ttr=ref_ttr, view=view, pixel=pixel)
+    job.ref_item = ref_item
+    job.ref_slots = set(win.ref_slots.values())
+    win.geo.reference = _drawn
+    win.get_reference()
+    return win.engine.calc_job(job)
+
+def bench_geometry(win, app, args, dsp_cif):
+    # hot paths at the current detector and geometry
+    # returns {path: timings [ms]}
+    res = dict()
+    geo = win.geo
+    # cone grid of the contour engine, one 2-theta level
+    _res = win.plo.cont_reso_max
+    _ttr = np.deg2rad(win.plo.cont_levels[len(win.plo.cont_levels)//2])
+    X, Y = np.meshgrid(np.linspace(-1, 1, _res), np.linspace(-1, 1, _res))
+    X, Y = X * geo.dist * np.tan(_ttr), Y * geo.dist * np.tan(_ttr)
+    Z = np.full_like(X, geo.dist)
+    _out = np.empty((3, _res, _res))
+    res['calc_cone'] = time_call(lambda: win.engine.calc_cone(X, Y, Z, geo.rota, geo.tilt, geo.xoff, geo.yoff, geo.dist, out=_out), args.repeat)
+    # geometry contours, calculation and drawing
+    view, pixel = get_view(win)
+    job = win.engine.get_job(geo, exp_ttr=np.deg2rad(win.plo.cont_levels), view=view, pixel=pixel)
+    res['calc_contours'] = time_call(lambda: win.engine.calc_job(job), args.repeat)
+    res['draw_contours'] = time_call(lambda: win.draw_contours(job), args.repeat)
+    # reference contours
+    job = get_ref_job(win, args.reference[:1])
+    res['draw_reference_pyfai'] = time_call(lambda: win.draw_reference(job), args.repeat)
+    if dsp_cif is not None:
+        job = get_ref_job(win, ['bench.cif'])
+        res['draw_reference_cif'] = time_call(lambda: win.draw_reference(job), args.repeat)
+    # all references at once, conversion and merging of the rings
+    _refs = args.reference + (['bench.cif'] if dsp_cif is not None else [])
+    if len(_refs) > 1:
+        job = get_ref_job(win, _refs)
+        res['draw_reference_multi'] = time_call(lambda: win.draw_reference(job), args.repeat)
+        _drawn = win.geo.reference
+        win.geo.reference = _refs
+        win.get_reference()
+        res['ref_ttr_multi'] = time_call(lambda: win.get_ref_ttr(geo.ener, geo.dist), args.repeat)
+        win.geo.reference = _drawn
+        win.get_reference()
+    # paint everything that is drawn
+    res['paint'] = time_call(lambda: win.ax.viewport().repaint(), args.repeat)
+    # slider drag, one tick: value change and frame
+    # from the limit minimum to the maximum
+    _sliders = {_s.objectName():_s for _s in win.sliderWidget.findChildren(QtWidgets.QSlider)}
+    for _p in args.drag:
+        if _p not in _sliders:
+            continue
+        _slider = _sliders[_p]
+        _start = _slider.value()
+        _times = []
+        for _v in np.linspace(_slider.minimum(), _slider.maximum(), args.ticks).round().astype(int):
+            _t0 = time.perf_counter()
+            _slider.setValue(int(_v))
+            win.scheduler.flush()
+            _times.append((time.perf_counter() - _t0) * 1e3)
+        res[f'drag_{_p}'] = _times
+        _slider.setValue(_start)
+        win.scheduler.flush()
+    app.processEvents()
+    return res
+
+def run(args):
+    pg.setConfigOptions(background='w', antialias=True)
+    app = QtWidgets.QApplication(sys.argv[:1])
+    # settings.json is only read
+    win = MainWindow(write_settings=False)
+    win.show()
+    app.processEvents()
+    # everything is calculated in the GUI thread, no timers
+    win.plo.render_thread = False
+    win.plo.render_stats = False
+    # repeated runs would only time the contour cache
+    win.plo.cont_cache_mb = 0
+    win.lod_timer.timeout.disconnect()
+    win.view_timer.timeout.disconnect()
+    # cif reference: parse once, see MainWindow.calc_cif_reflections()
+    # the reflections are not added to the cif cache
+    results = []
+    dsp_cif = None
+    if args.cif is not None:
+        _t0 = time.perf_counter()
+        with tempfile.TemporaryDirectory() as _tmp:
+            dsp_cif = win.calc_cif_reflections(args.cif, os.path.basename(args.cif), os.path.join(_tmp, 'bench.npz'))
+        # known to the window, not to the menu
+        win.geo.ref_custom['bench.cif'] = dsp_cif
+        results.append({'detector':None, 'geometry':None, 'path':'cif_reflections', **get_stats([(time.perf_counter() - _t0) * 1e3])})
+    base = {_p:getattr(win.geo, _p) for _p in ('dist', 'rota', 'tilt', 'xoff', 'yoff', 'ener')}
+    geometries = get_geometries(win.lmt)
+    for det_type, det_lib in win.detectors.items():
+        for det_size in det_lib['size']:
+            det_name = f'{det_type} {det_size}'
+            if args.detectors and not any(det_name.upper().startswith(_d.upper()) for _d in args.detectors):
+                continue
+            print(f'Benchmark: {det_name}', file=sys.stderr)
+            win.set_geometry(base)
+            _res = {'change_detector':time_call(lambda: win.change_detector(det_type, det_size), args.repeat),
+                    'build_detector':time_call(win.build_detector, args.repeat)}
+            for _path, _times in _res.items():
+                results.append({'detector':det_name, 'geometry':None, 'path':_path, **get_stats(_times)})
+            for geo_name, pars in geometries.items():
+                if args.geometries and geo_name not in args.geometries:
+                    continue
+                win.set_geometry({**base, **pars})
+                for _path, _times in bench_geometry(win, app, args, dsp_cif).items():
+                    results.append({'detector':det_name, 'geometry':geo_name, 'path':_path, **get_stats(_times)})
+    out = {'meta':get_meta(win), 'results':results}
+    win.close()
+    return out
+
+def compare(new, old, threshold):
+    # median of every (detector, geometry, path) in both runs
+    _key = lambda _r: (_r['detector'], _r['geometry'], _r['path'])
+    _old = {_key(_r):_r for _r in old['results']}
+    print(f'{"detector":<16} {"geometry":<12} {"path":<22} {"old ms":>9} {"new ms":>9} {"ratio":>6}')
+    for _r in new['results']:
+        if _key(_r) not in _old:
+            continue
+        _o = _old[_key(_r)]['median']
+        _ratio = _r['median'] / _o if _o > 0 else np.nan
+        _flag = ' slower' if _ratio > 1 + threshold else (' faster' if _ratio < 1 - threshold else '')
+        print(f'{str(_r["detector"]):<16} {str(_r["geometry"]):<12} {_r["path"]:<22} {_o:9.2f} {_r["median"]:9.2f} {_ratio:6.2f}{_flag}')
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the geometry and drawing hot paths (headless).')
+    parser.add_argument('-o', '--out', default='bench.json', help='output file (.json)')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='timed runs per path')
+    parser.add_argument('-t', '--ticks', type=int, default=25, help='slider ticks per drag')
+    parser.add_argument('--drag', nargs='*', default=['dist', 'ener'], metavar='PAR', help='sliders to drag, e.g. dist ener')
+    parser.add_argument('-d', '--detectors', nargs='*', default=None, metavar='DET', help='detectors (prefix), e.g. EIGER2 "PILATUS3 2M", default: all')
+    parser.add_argument('-g', '--geometries', nargs='*', default=None, metavar='GEO', help='geometries: ' + ', '.join(get_geometries(get_specs_lmt())))
+    parser.add_argument('--reference', nargs='+', default=['LaB6'], metavar='REF', help='pyFAI references, the first one alone, all together if more are given, e.g. LaB6 CeO2 Si')
+    parser.add_argument('--cif', default=None, help='cif file for the cif reference benchmark')
+    parser.add_argument('--compare', default=None, metavar='FILE', help='compare with an older result (.json)')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative change to flag in the comparison')
+    args = parser.parse_args()
+
+    res = run(args)
+    with open(args.out, 'w') as wf:
+        json.dump(res, wf, indent=1)
+    if args.compare is not None:
+        with open(args.compare, 'r') as of:
+            compare(res, json.load(of), args.threshold)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,1355 @@
+import os, sys, json, copy, threading, collections, contextlib, time, argparse, zipfile, multiprocessing
+import numpy as np
+
+###########################################################
+# Geometry engine of detgeo_pyqt6, no Qt needed
+# - settings, detector library and module layout
+# - contour calculation (ContourEngine)
+# - reference d spacings (ReferenceStore, compile_calibrants)
+# - batch evaluation of geometries (calc_batch) and the
+#   command line interface: python detgeo_core.py -h
+# - per pixel maps of the detector (calc_pixel_maps)
+# - per frame timing of the render stages (trace_stage, FrameTrace)
+# - contourpy and pyFAI are imported when needed
+###########################################################
+
+class container(object):
+    pass
+
+def get_specs_geo():
+    ######################
+    # Setup the geometry #
+    ######################
+    geo = container()
+    geo.det_type = 'EIGER2' # [str]  Pilatus3 / Eiger2
+    geo.det_size = '4M'     # [str]  300K 1M 2M 6M / 1M 4M 9M 16M
+    geo.ener = 21.0         # [keV]  Beam energy
+    geo.dist = 75.0         # [mm]   Detector distance
+    geo.yoff = 0.0          # [mm]   Detector offset (vertical)
+    geo.xoff = 0.0          # [mm]   Detector offset (horizontal)
+    geo.rota = 25.0         # [deg]  Detector rotation
+    geo.tilt = 0.0          # [deg]  Detector tilt
+    geo.unit = 1            # [0-3]  Contour legend
+                            #          0: 2-Theta
+                            #          1: d-spacing
+                            #          2: q-space
+                            #          3: sin(theta)/lambda
+    geo.reference = []      # [list] Plot reference contours
+                            #          pick from pyFAI or cif files
+    return geo
+
+def get_specs_plo():
+    ################
+    # Plot Details #
+    ################
+    plo = container()
+    # - geometry contour section -
+    plo.cont_tth_min = 5                # [int]    Minimum 2-theta contour line
+    plo.cont_tth_max = 120              # [int]    Maximum 2-theta contour line
+    plo.cont_tth_num = 24               # [int]    Number of contour lines
+    plo.cont_geom_cmark = 'o'           # [marker] Beam center marker (geometry)
+    plo.cont_geom_csize = 6             # [int]    Beam center size (geometry)
+    plo.cont_geom_lw = 4.0              # [float]  Contour linewidth
+    plo.cont_geom_label_size = 14       # [int]    Contour label size
+    plo.cont_geom_cmap_name = 'viridis' # [cmap]   Contour colormap (geometry)
+    # - reference contour section -
+    plo.cont_ref_alpha = 0.25           # [float]  Reference contour alpha
+    plo.cont_ref_color = 'gray'         # [color]  Reference contour color
+    plo.cont_ref_lw = 5.0               # [float]  Reference contour linewidth
+    plo.cont_ref_num = 48               # [int]    Number of reference contours
+    plo.cont_ref_cache = 16             # [int]    Number of references kept in memory
+    plo.cont_ref_colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b']
+                                        # [list]   Colors of further references (cycled)
+    plo.cont_ref_merge = 1.0            # [float]  Merge reference rings closer than this [pix]
+    # - module section -
+    plo.module_alpha = 0.20             # [float]  Detector module alpha
+    plo.module_color = 'gray'           # [color]  Detector module color
+    # - heatmap section -
+    plo.heat_map = 'None'               # [str]    Heatmap on the modules
+                                        #            None, d, q, omega (solid angle)
+    plo.heat_cmap_name = 'magma'        # [cmap]   Heatmap colormap
+    plo.heat_alpha = 0.5                # [float]  Heatmap alpha
+    plo.heat_px = 2.0                   # [float]  Heatmap pixel size on screen, px
+    plo.heat_cache = 16                 # [int]    Number of heatmap geometries kept in memory
+    # - general section -
+    plo.cont_reso_min = 48              # [int]    Minimum contour steps
+    plo.cont_reso_max = 256             # [int]    Maximum contour steps
+    plo.cont_engine = 'conic'           # [str]    Contour engine
+                                        #            conic: analytic conic sections
+                                        #            grid: 2-theta grid + contourpy
+                                        #            contour: cone grid + contourpy
+    plo.cont_conic_num = 1024           # [int]    Azimuthal steps (conic engine)
+    plo.cont_conic_px = 2.0             # [float]  Azimuthal step on screen, px (conic engine)
+    plo.cont_float32 = False            # [bool]   Single precision cone grid (contour engine)
+    plo.cont_decimate = 1.0             # [float]  Contour line tolerance, px (0: all points)
+    plo.cont_cache_mb = 64.0            # [float]  Memory for cached contour lines, MB (0: off)
+    plo.cont_prefetch = 2               # [int]    Slider positions calculated ahead on either
+                                        #          side while dragging (0: off)
+    plo.plot_size = 768                 # [int]    Plot size, px
+    plo.unit_label_size = 16            # [int]    Label size, px
+    plo.unit_label_color = 'gray'       # [str]    Label color
+    plo.unit_label_fill = 'white'       # [str]    Label fill color
+    plo.plot_color = 0.35               # [float]  Button color from colormap (0.0 - 1.0)
+                                        # [str]    Button color e.g. '#1f77b4'
+    plo.render_fps = 30                 # [int]    Maximum redraws per second (sliders)
+    plo.render_stats = False            # [bool]   Print skipped renders on slider release
+    plo.startup_stats = False           # [bool]   Print startup timing
+    plo.render_thread = True            # [bool]   Calculate contours in a worker thread
+    plo.render_budget = 20              # [int]    Time budget per frame while dragging, ms
+                                        #          the contour resolution is lowered to fit
+    plo.render_idle = 250               # [int]    Refine the contours after idle time, ms
+    plo.render_refine = 2.0             # [float]  Contour resolution factor when idle
+    plo.render_view = 150               # [int]    Recalculate the contours after pan/zoom, ms
+    plo.sweep_num = 64                  # [int]    Grid points per axis (coverage map)
+    plo.sweep_workers = 0               # [int]    Worker processes (coverage map), 0: all CPUs
+    plo.trace = False                   # [bool]   Time the render stages of every frame
+                                        #          also enabled by the environment variable
+                                        #          DETGEO_TRACE=1 (or a trace file name)
+    plo.trace_overlay = True            # [bool]   Show the timing of the last frame on the plot
+    plo.trace_file = 'trace.csv'        # [str]    Trace of the latest frames (.csv or .json), '': none
+    plo.trace_len = 500                 # [int]    Number of frames in the trace
+    # -slider section -
+    plo.action_ener = True              # [bool]   Show energy slider
+    plo.action_dist = True              # [bool]   Show distance slider
+    plo.action_rota = True              # [bool]   Show rotation slider
+    plo.action_yoff = True              # [bool]   Show vertical offset slider
+    plo.action_xoff = True              # [bool]   Show horizontal offset slider
+    plo.action_tilt = True              # [bool]   Show tilt slider
+
+    return plo
+
+def get_specs_lmt():
+    ##########
+    # Limits #
+    ##########
+    lmt = container()
+    lmt.ener_min = 1.0   # [float] Energy minimum [keV]
+    lmt.ener_max = 100.0 # [float] Energy maximum [keV]
+    lmt.ener_stp = 1.0   # [float] Energy step size [keV]
+    lmt.dist_min = 40.0  # [float] Distance minimum [mm]
+    lmt.dist_max = 150.0 # [float] Distance maximum [mm]
+    lmt.dist_stp = 1.0   # [float] Distance step size [mm]
+    lmt.xoff_min = -50.0 # [float] Horizontal offset minimum [mm]
+    lmt.xoff_max = 50.0  # [float] Horizontal offset maximum [mm]
+    lmt.xoff_stp = 1.0   # [float] Horizontal offset step size [mm]
+    lmt.yoff_min = 0.0   # [float] Vertical offset minimum [mm]
+    lmt.yoff_max = 200.0 # [float] Vertical offset maximum [mm]
+    lmt.yoff_stp = 1.0   # [float] Vertical offset step size [mm]
+    lmt.rota_min = 0.0   # [float] Rotation minimum [deg]
+    lmt.rota_max = 75.0  # [float] Rotation maximum [deg]
+    lmt.rota_stp = 1.0   # [float] Rotation step size [deg]
+    lmt.tilt_min = 0.0   # [float] Tilt minimum [deg]
+    lmt.tilt_max = 45.0  # [float] Tilt maximum [deg]
+    lmt.tilt_stp = 1.0   # [float] Tilt step size [deg]
+
+    return lmt
+
+def load_par(save_as, geo, plo, lmt):
+    # Opening JSON file as dict
+    with open(save_as, 'r') as of:
+        pars = json.load(of)
+    conv = {'geo':geo, 'plo':plo, 'lmt':lmt}
+    for key, vals in pars.items():
+            for p, x in vals.items():
+                setattr(conv[key], p, x)
+
+def get_specs_det(detectors, det_type, det_size):
+    det_type = det_type.upper()
+    det_size = det_size.upper()
+
+    if det_type not in detectors.keys():
+        print('Unknown detector type!')
+        raise SystemExit
+
+    if det_size not in detectors[det_type]['size'].keys():
+        print('Unknown detector type/size combination!')
+        raise SystemExit
+
+    det = container()
+    det.hms = detectors[det_type]['hms']
+    det.vms = detectors[det_type]['vms']
+    det.pxs = detectors[det_type]['pxs']
+    det.hgp = detectors[det_type]['hgp']
+    det.vgp = detectors[det_type]['vgp']
+    det.cbh = detectors[det_type]['cbh']
+    det.hmn, det.vmn = detectors[det_type]['size'][det_size]
+    det.name = f'{det_type} {det_size}'
+
+    return det
+
+def get_det_library(path):
+    ###########################
+    # Detector Specifications #
+    ###########################
+    detectors = dict()
+        ###############################
+        # Specifications for Pilatus3 #
+        ###############################
+    detectors['PILATUS3'] = {
+        'hms' : 83.8,    # [mm]  Module size (horizontal)
+        'vms' : 33.5,    # [mm]  Module size (vertical)
+        'pxs' : 172e-3,  # [mm]  Pixel size
+        'hgp' : 7,       # [pix] Gap between modules (horizontal)
+        'vgp' : 17,      # [pix] Gap between modules (vertical)
+        'cbh' : 0,       # [mm]  Central beam hole
+        'size' : {'300K':(1,3),'1M':(2,5),'2M':(3,8),'6M':(5,12)},
+        }
+        ###############################
+        # Specifications for Pilatus4 #
+        ###############################
+    detectors['PILATUS4'] = {
+        'hms' : 75.0,    # [mm]  Module size (horizontal)
+        'vms' : 39.0,    # [mm]  Module size (vertical)
+        'pxs' : 150e-3,  # [mm]  Pixel size
+        'hgp' : 8,       # [pix] Gap between modules (horizontal)
+        'vgp' : 12,      # [pix] Gap between modules (vertical)
+        'cbh' : 0,       # [mm]  Central beam hole
+        'size' : {'260K':(1,2),'800K':(2,3),'1M':(2,4),'1.5M':(3,4),'2M':(3,6),'3M':(4,6)}
+        }
+
+        #############################
+        # Specifications for Eiger2 #
+        #############################
+    detectors['EIGER2'] = {
+        'hms' : 77.1,    # [mm]  Module size (horizontal)
+        'vms' : 38.4,    # [mm]  Module size (vertical)
+        'pxs' : 75e-3,   # [mm]  Pixel size
+        'hgp' : 38,      # [pix] Gap between modules (horizontal)
+        'vgp' : 12,      # [pix] Gap between modules (vertical)
+        'cbh' : 0,       # [mm]  Central beam hole
+        'size' : {'1M':(1,2),'4M':(2,4),'9M':(3,6),'16M':(4,8)},
+        }
+
+        #############################
+        # Specifications for MPCCD #
+        #############################
+    detectors['MPCCD'] = {
+        'hms' : 51.2,    # [mm]  Module size (horizontal)
+        'vms' : 25.6,    # [mm]  Module size (vertical)
+        'pxs' : 50e-3,   # [mm]  Pixel size
+        'hgp' : 18,      # [pix] Gap between modules (horizontal)
+        'vgp' : 27,      # [pix] Gap between modules (vertical)
+        'cbh' : 3,       # [mm]  Central beam hole
+        'size' : {'4M':(2,4)},
+        }
+
+    # make file dump
+    file_dump = os.path.join(path, 'detectors.json')
+    if not os.path.exists(file_dump):
+        with open(file_dump, 'w') as wf:
+            json.dump(detectors, wf, indent=4)
+    else:
+        with open(file_dump, 'r') as of:
+            detectors = json.load(of)
+
+    return detectors
+
+def calc_det_dims(det):
+    # half width and height of the detector [mm]
+    xdim = (det.hms * det.hmn + det.pxs * det.hgp * det.hmn + det.cbh)/2
+    ydim = (det.vms * det.vmn + det.pxs * det.vgp * det.vmn + det.cbh)/2
+    return xdim, ydim
+
+def calc_modules(det):
+    # detector module rectangles, (N,4) array [x, y, width, height]
+    # beam position is between the modules (even) or at the center module (odd)
+    # determined by the "+det.hmn%2" part
+    i = np.arange(-det.hmn//2+det.hmn%2, det.hmn-det.hmn//2)
+    j = np.arange(-det.vmn//2+det.vmn%2, det.vmn-det.vmn//2)
+    i, j = [_a.ravel() for _a in np.meshgrid(i, j, indexing='ij')]
+    # - place modules along x (i) and y (j) keeping the gaps in mind ( + (det.hgp*det.pxs)/2)
+    # - the " - ((det.hms+det.hgp*det.pxs)/2)" positions the origin (the beam) at the center of a module
+    #   and "det.hmn%2" makes sure this is only active for detectors with an odd number of modules
+    # - define sets of panels that collectively move to realize a central hole offset for MPCCD detectors
+    #   that are used at SACLA/SPring-8:
+    #   x = (...) + (det.cbh/2)*(2*(j&det.vmn)//det.vmn-1)
+    #   y = (...) + (det.cbh/2)*(1-2*(i&det.hmn)//det.hmn)
+    # - negative values of det.cbh for 'clockwise' offset order
+    origin_x = i * (det.hms + det.hgp * det.pxs) \
+                 - ((det.hms + det.hgp * det.pxs)/2) * (det.hmn % 2) \
+                 + (det.hgp * det.pxs)/2 \
+                 + (det.cbh/2) * (2*(j & det.vmn) // det.vmn-1)
+    origin_y = j * (det.vms + det.vgp * det.pxs) \
+                 - ((det.vms + det.vgp * det.pxs)/2) * (det.vmn%2) \
+                 + (det.vgp * det.pxs)/2 \
+                 + (det.cbh/2) * (1-2*(i & det.hmn) // det.hmn)
+    return np.column_stack([origin_x, origin_y, np.full(i.shape, det.hms), np.full(i.shape, det.vms)]).astype(float)
+
+def calc_tth(X, Y, rota, tilt, xoff, yoff, dist):
+    # inverse of ContourEngine.calc_cone()
+    # 2-theta [deg] at the plot positions X, Y
+    # all arguments broadcast, e.g. positions (1,N) and geometries (M,1)
+    a = np.deg2rad(tilt) + np.deg2rad(rota)
+    comp = np.deg2rad(tilt) * dist
+    # back to the rotated frame, the detector plane is at Z = dist
+    _x = Y - comp + yoff
+    _y = X - xoff
+    # revert the rotation
+    X0 = _x*np.cos(a) + dist*np.sin(a)
+    Z0 = dist*np.cos(a) - _x*np.sin(a)
+    return np.rad2deg(np.arctan2(np.hypot(X0, _y), Z0))
+
+def calc_beam_center(rota, tilt, xoff, yoff, dist):
+    # position where the beam axis hits the detector plane
+    # see calc_tth(): X0 = 0, Y0 = 0
+    # forward (cos(a) > 0: 2-theta = 0) or backward (cos(a) < 0: 2-theta = 180)
+    a = np.deg2rad(tilt) + np.deg2rad(rota)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        _by = -dist*np.tan(a) + np.deg2rad(tilt)*dist - yoff
+    return np.broadcast_to(xoff, np.shape(_by)), _by, np.cos(a)
+
+def calc_tth_range(rect, rota, tilt, xoff, yoff, dist):
+    # 2-theta range [deg] within the rectangle rect (x0, x1, y0, y1)
+    # the extrema of 2-theta on a line are at its ends or at a
+    # single minimum/maximum in between, sample the border of the
+    # rectangle densely enough to find them
+    # the geometry may be given as arrays, vectorized over geometries
+    _x0, _x1, _y0, _y1 = rect
+    _t = np.linspace(0, 1, 256)
+    X = np.concatenate([_x0 + (_x1-_x0)*_t, np.full_like(_t, _x1), _x1 - (_x1-_x0)*_t, np.full_like(_t, _x0)])
+    Y = np.concatenate([np.full_like(_t, _y0), _y0 + (_y1-_y0)*_t, np.full_like(_t, _y1), _y1 - (_y1-_y0)*_t])
+    _pars = [np.asarray(_p, dtype=float)[...,None] for _p in (rota, tilt, xoff, yoff, dist)]
+    _tth = calc_tth(X, Y, *_pars)
+    # margin for the sampling
+    _tth_min, _tth_max = np.min(_tth, axis=-1) - 0.1, np.max(_tth, axis=-1) + 0.1
+    # the only extremum on the plane is where the beam axis hits it
+    # 0 degree (forward) or 180 degree (backward, rota + tilt > 90)
+    _bx, _by, _cos = calc_beam_center(rota, tilt, xoff, yoff, dist)
+    _inside = (_x0 <= _bx) & (_bx <= _x1) & (_y0 <= _by) & (_by <= _y1) & ~np.isclose(_cos, 0)
+    _tth_min = np.where(_inside & (_cos > 0), 0.0, _tth_min)
+    _tth_max = np.where(_inside & (_cos < 0), 180.0, _tth_max)
+    return _tth_min, _tth_max
+
+def clip_lines(clines, rect):
+    # interrupt the contour line (NaN) outside of rect (x0, x1, y0, y1)
+    # the first points outside are kept and moved onto the border,
+    # where the line to their inside neighbour crosses it
+    if clines is None:
+        return None
+    _x0, _x1, _y0, _y1 = rect
+    X, Y = clines[:,0], clines[:,1]
+    with np.errstate(invalid='ignore'):
+        _in = (X >= _x0) & (X <= _x1) & (Y >= _y0) & (Y <= _y1)
+    if not _in.any():
+        return None
+    _keep = _in.copy()
+    _keep[1:] |= _in[:-1]
+    _keep[:-1] |= _in[1:]
+    _keep &= np.isfinite(X) & np.isfinite(Y)
+    clines = clines.copy()
+    _out = np.flatnonzero(_keep & ~_in)
+    if len(_out) > 0:
+        # inside neighbour, previous point first
+        _nb = np.where(_in[np.maximum(_out-1, 0)] & (_out > 0), _out-1, _out+1)
+        _pi, _po = clines[_nb], clines[_out]
+        _d = _po - _pi
+        # fraction of the way to the border (x and y)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            _tx = np.where(_po[:,0] < _x0, (_x0 - _pi[:,0])/_d[:,0], np.where(_po[:,0] > _x1, (_x1 - _pi[:,0])/_d[:,0], 1.0))
+            _ty = np.where(_po[:,1] < _y0, (_y0 - _pi[:,1])/_d[:,1], np.where(_po[:,1] > _y1, (_y1 - _pi[:,1])/_d[:,1], 1.0))
+        clines[_out] = _pi + np.minimum(_tx, _ty)[:,None] * _d
+    clines[~_keep] = np.nan
+    return clines
+
+def join_segments(segs):
+    # join the segments of a contour line, interrupted by NaN
+    # None if there are no segments
+    if len(segs) == 0:
+        return None
+    _nan = np.full((1,2), np.nan)
+    return np.concatenate([_p for _s in segs for _p in (_s, _nan)][:-1])
+
+def join_lines(clines):
+    # join contour lines (NaN interrupted or None) into one vertex
+    # buffer without NaN and a connect mask
+    #  connect[i]: draw a line from point i to point i+1
+    # returns X, Y, connect
+    _lines = [_l for _l in clines if _l is not None and len(_l) > 0]
+    if len(_lines) == 0:
+        return np.zeros(0), np.zeros(0), np.zeros(0, dtype=bool)
+    _xy = np.concatenate(_lines)
+    _fin = np.isfinite(_xy).all(axis=1)
+    _con = np.zeros(len(_xy), dtype=bool)
+    _con[:-1] = _fin[:-1] & _fin[1:]
+    # lines are not connected to each other
+    _con[np.cumsum([len(_l) for _l in _lines]) - 1] = False
+    return _xy[_fin,0], _xy[_fin,1], _con[_fin]
+
+def decimate_lines(X, Y, connect, tol):
+    # simplify a vertex buffer (see join_lines()) to the tolerance
+    # tol (x, y), e.g. the size of a screen pixel
+    # points in the same cell of a tol sized grid as their predecessor
+    # are dropped, the first and last point of a segment are kept
+    # returns X, Y, connect
+    if len(X) < 3:
+        return X, Y, connect
+    _qx = np.floor(X / tol[0])
+    _qy = np.floor(Y / tol[1])
+    _keep = np.ones(len(X), dtype=bool)
+    _keep[1:] = (_qx[1:] != _qx[:-1]) | (_qy[1:] != _qy[:-1]) | ~connect[:-1]
+    _keep |= ~connect
+    return X[_keep], Y[_keep], connect[_keep]
+
+def calc_conic(_ttr, rota, tilt, xoff, yoff, dist, steps):
+    # conic sections of the 2-theta values _ttr [rad] sampled at
+    # steps azimuths from 0 to 2pi
+    # returns X, Y: (levels, steps) arrays, NaN where the cone
+    # doesn't reach the detector plane
+    phi = np.linspace(0, 2*np.pi, steps)
+    # shape: (levels, azimuth)
+    return calc_conic_phi(np.atleast_1d(_ttr)[:,None], phi[None,:], rota, tilt, xoff, yoff, dist)
+
+def calc_conic_phi(_ttr, phi, rota, tilt, xoff, yoff, dist):
+    # the cone of opening angle 2-theta is parametrized by the
+    # azimuth (phi) and the scale (t) of its unit vectors
+    #  (sin(2t)cos(phi), sin(2t)sin(phi), cos(2t)) * t
+    # apply the same rotation as ContourEngine.calc_cone() and
+    # solve Z = dist for t
+    # _ttr and phi [rad] are broadcast against each other
+    # returns X, Y, NaN where the cone doesn't reach the detector plane
+    a = np.deg2rad(tilt) + np.deg2rad(rota)
+    _st = np.sin(_ttr)
+    _ct = np.cos(_ttr)
+    _cp = np.cos(phi)
+    _sp = np.sin(phi)
+    # Z = t * (sin(a)sin(2t)cos(phi) + cos(a)cos(2t))
+    _den = np.sin(a)*_st*_cp + np.cos(a)*_ct
+    # the backside of the cone never reaches the detector plane
+    # parabola/hyperbola: den -> 0, the line runs off to infinity
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = dist / np.where(_den > 1e-9, _den, np.nan)
+    X = t * (np.cos(a)*_st*_cp - np.sin(a)*_ct)
+    Y = t * _st*_sp
+    # compensate for tilt not rotating, see ContourEngine.calc_cone()
+    comp = np.deg2rad(tilt) * dist
+    return Y+xoff, X+comp-yoff
+
+def calc_conic_view(_ttr, rota, tilt, xoff, yoff, dist, rect, pixel, step):
+    # conic sections of the 2-theta values _ttr [rad] within
+    # rect (x0, x1, y0, y1), sampled every step screen pixels
+    # - pixel: size of a screen pixel (x, y) in detector units
+    # the azimuth is cut into intervals, intervals that can't reach
+    # rect are dropped and the others are split until their chord
+    # is short on screen, the work follows the visible line length
+    # instead of the ring size
+    # returns a list of (N,2) arrays [x, y] or None, interrupted by NaN
+    _ttr = np.atleast_1d(_ttr)
+    _x0, _x1, _y0, _y1 = rect
+    _px = np.asarray(pixel, dtype=float)
+    # start with an even number of intervals: the valid azimuths
+    # (den > 0) are one interval around phi = 0 or pi, an interval
+    # with both ends invalid can't contain valid azimuths
+    _div = 8
+    _num = 64
+    lev = np.repeat(np.arange(len(_ttr)), _num)
+    phi = np.tile(np.arange(_num) * (2*np.pi/_num), len(_ttr))
+    dphi = np.full(len(lev), 2*np.pi/_num)
+    # the coarse pass is split at most _div**6 times, an interval
+    # with one invalid end is dropped once it is that short
+    for _ in range(7):
+        X0, Y0 = calc_conic_phi(_ttr[lev], phi, rota, tilt, xoff, yoff, dist)
+        X1, Y1 = calc_conic_phi(_ttr[lev], phi+dphi, rota, tilt, xoff, yoff, dist)
+        _nan0 = np.isnan(X0)
+        _nan1 = np.isnan(X1)
+        _edge = _nan0 ^ _nan1
+        # the arc stays close to its chord, within half the chord
+        # length is safe for these intervals
+        _len = np.hypot(X1-X0, Y1-Y0)
+        _vis = ((np.fmax(X0, X1) + _len/2 >= _x0) & (np.fmin(X0, X1) - _len/2 <= _x1) &
+                (np.fmax(Y0, Y1) + _len/2 >= _y0) & (np.fmin(Y0, Y1) - _len/2 <= _y1))
+        _pix = np.hypot((X1-X0)/_px[0], (Y1-Y0)/_px[1])
+        _split = (_vis & (_pix > step * _div)) | _edge
+        _keep = _vis & ~_split
+        if _ == 6:
+            _keep = _vis & ~_edge
+        if not _split.any() or _ == 6:
+            break
+        # split into _div intervals
+        _sub = np.arange(_div) / _div
+        lev_n = np.repeat(lev[_split], _div)
+        phi_n = (phi[_split][:,None] + dphi[_split][:,None] * _sub[None,:]).ravel()
+        dphi_n = np.repeat(dphi[_split] / _div, _div)
+        lev = np.concatenate([lev[_keep], lev_n])
+        phi = np.concatenate([phi[_keep], phi_n])
+        dphi = np.concatenate([dphi[_keep], dphi_n])
+    lev, phi, dphi, _pix = lev[_keep], phi[_keep], dphi[_keep], _pix[_keep]
+    clines = [None] * len(_ttr)
+    if len(lev) == 0:
+        return clines
+    _ord = np.lexsort((phi, lev))
+    lev, phi, dphi, _pix = lev[_ord], phi[_ord], dphi[_ord], _pix[_ord]
+    # consecutive intervals share their end point, the line is
+    # interrupted (NaN) after an interval without a successor
+    _next = np.zeros(len(lev), dtype=bool)
+    _next[:-1] = (lev[1:] == lev[:-1]) & np.isclose(phi[1:], phi[:-1] + dphi[:-1])
+    _n = np.clip(np.ceil(_pix / step), 1, _div).astype(int)
+    # points per interval: _n samples, end point and NaN if the line ends
+    _cnt = _n + 2 * ~_next
+    _rep = np.repeat(np.arange(len(lev)), _cnt)
+    _pos = np.arange(len(_rep)) - np.repeat(np.cumsum(_cnt) - _cnt, _cnt)
+    _phi = phi[_rep] + dphi[_rep] * np.minimum(_pos, _n[_rep]) / _n[_rep]
+    X, Y = calc_conic_phi(_ttr[lev[_rep]], _phi, rota, tilt, xoff, yoff, dist)
+    _gap = _pos > _n[_rep]
+    X[_gap] = np.nan
+    Y[_gap] = np.nan
+    # one line per level
+    _lev = lev[_rep]
+    _cut = np.flatnonzero(np.diff(_lev)) + 1
+    for _l, _x, _y in zip(_lev[np.r_[0, _cut]], np.split(X, _cut), np.split(Y, _cut)):
+        clines[_l] = np.column_stack([_x, _y])
+    return clines
+
+# render stages of a frame, see trace_stage()
+trace_stages = ('reference', 'grid', 'calc_cone', 'contourpy', 'conic', 'heatmap', 'decimate', 'setData', 'paint')
+
+@contextlib.contextmanager
+def trace_stage(stages, name):
+    # add the time spent in the block to stages[name] [ms]
+    # stages None: tracing is off, nothing is timed
+    if stages is None:
+        yield
+        return
+    _t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages[name] = stages.get(name, 0.0) + (time.perf_counter() - _t0) * 1e3
+
+class FrameTrace(object):
+    # the latest frames (dicts), written to save_as (.csv or .json)
+    # every flush frames and by save()
+    def __init__(self, size, save_as=None, flush=30):
+        self.frames = collections.deque(maxlen=size)
+        self.save_as = save_as
+        self.flush = flush
+        self.count = 0
+
+    def add(self, frame):
+        self.frames.append(frame)
+        self.count += 1
+        if self.save_as and self.count % self.flush == 0:
+            self.save()
+
+    def save(self):
+        if not self.save_as or len(self.frames) == 0:
+            return
+        if os.path.splitext(self.save_as)[1] == '.json':
+            with open(self.save_as, 'w') as wf:
+                json.dump(list(self.frames), wf, indent=1)
+            return
+        # stages first, then everything else in order of appearance
+        _cols = list(trace_stages)
+        for _f in self.frames:
+            _cols.extend(_k for _k in _f if _k not in _cols)
+        with open(self.save_as, 'w') as wf:
+            wf.write(','.join(_cols) + '\n')
+            for _f in self.frames:
+                wf.write(','.join(self.format(_f.get(_c, '')) for _c in _cols) + '\n')
+
+    @staticmethod
+    def format(value):
+        if isinstance(value, float):
+            return f'{value:.3f}'
+        if isinstance(value, (list, tuple, set)):
+            return ' '.join(sorted(str(_v) for _v in value))
+        return str(value)
+
+class ContourEngine(object):
+    # calculates the contour lines of a job, pure numpy
+    # a job (see get_job()) holds a snapshot of the geometry and
+    # the levels, the results are stored in the job
+    # - the engine keeps buffers and caches between jobs,
+    #   calculations are serialized by a lock
+    def __init__(self, plo, det):
+        self.plo = plo
+        self.lock = threading.Lock()
+        # shared 2-theta contour generator (grid engine)
+        self.grid_gen = None
+        # reusable cone grid buffers and rotation matrices (contour engine)
+        self.cone_buffer = None
+        self.rot_cache = {}
+        # heatmaps of the latest geometries
+        self.heat_cache = collections.OrderedDict()
+        # contour lines per geometry and level set, see calc_contours()
+        self.line_cache = collections.OrderedDict()
+        self.line_cache_size = 0
+        self.set_detector(det)
+
+    def set_detector(self, det):
+        # the worker thread might be calculating (or prefetching)
+        # a job of the old detector, wait for it
+        with self.lock:
+            self.det = det
+            self.xdim, self.ydim = calc_det_dims(det)
+            self.grid_gen = None
+            self.heat_cache.clear()
+            self.line_cache.clear()
+            self.line_cache_size = 0
+
+    def get_job(self, geo, exp_ttr=None, ref_ttr=None, view=None, scale=1.0, pixel=None):
+        # a job for geometry geo
+        # - exp_ttr: geometry contour levels [rad] or None
+        # - ref_ttr: reference contour levels [rad], NaN: not reachable
+        # - view: visible area (x0, x1, y0, y1), contours outside are skipped
+        # - pixel: screen pixel size (x, y) of the view, the conic
+        #          engine samples the visible lines at this density
+        job = container()
+        job.geo = copy.copy(geo)
+        # contour lines are clipped to the detector area
+        # rectangles: (x0, x1, y0, y1)
+        job.clip = (-self.xdim, self.xdim, -self.ydim, self.ydim)
+        job.view = job.clip if view is None else view
+        job.pixel = pixel
+        job.culled = 0
+        job.exp_ttr = exp_ttr
+        job.ref_ttr = np.zeros(0) if ref_ttr is None else np.asarray(ref_ttr, dtype=float)
+        job.ref_idx = np.arange(len(job.ref_ttr))
+        job.exp = None
+        job.ref = None
+        # contour resolution factor and calculation time [ms]
+        job.scale = scale
+        job.preview = False
+        job.calc_time = 0.0
+        # heatmap pixel size in screen pixels, None: no heatmap
+        job.heat_step = None
+        job.heat = None
+        # time per render stage [ms], None: not traced, see trace_stage()
+        job.stages = dict() if self.plo.trace else None
+        # contour sets taken from the cache
+        job.cached = 0
+        # jobs of the neighbouring slider positions, calculated by
+        # the worker when it is idle, see ContourWorker
+        job.prefetch = []
+        return job
+
+    def calc_job(self, job, cancelled=None):
+        # calculate the contour lines of job
+        # this may run in a worker thread
+        # - cancelled(): True if the job is superseded, returns None
+        # the lock protects the shared buffers and caches
+        with self.lock:
+            _t0 = time.perf_counter()
+            if job.exp_ttr is not None:
+                job.exp = self.calc_contours(job.exp_ttr, job, cancelled)
+            if cancelled is not None and cancelled():
+                return None
+            # unreachable rings are not calculated
+            _ttr = job.ref_ttr[job.ref_idx]
+            _valid = ~np.isnan(_ttr)
+            _lines = iter(self.calc_contours(_ttr[_valid], job, cancelled))
+            job.ref = [next(_lines) if _v else None for _v in _valid]
+            if cancelled is not None and cancelled():
+                return None
+            if job.heat_step is not None:
+                with trace_stage(job.stages, 'heatmap'):
+                    job.heat = self.calc_heatmap(job)
+            job.calc_time = (time.perf_counter() - _t0) * 1e3
+        return job
+
+    def calc_contours(self, _ttr, job, cancelled=None):
+        # contour lines for an array of 2-theta values [rad], see calc_lines()
+        # the lines are cached per quantized geometry and level set,
+        # the sliders move in steps and scrubbing revisits geometries
+        # the least recently used lines are dropped beyond plo.cont_cache_mb
+        # the cached arrays are shared and must not be modified
+        if self.plo.cont_cache_mb <= 0:
+            return self.calc_lines(_ttr, job, cancelled)
+        geo = job.geo
+        _key = (round(geo.dist, 3), round(geo.rota, 3), round(geo.tilt, 3), round(geo.xoff, 3), round(geo.yoff, 3),
+                np.asarray(_ttr, dtype=float).tobytes(), self.plo.cont_engine, job.clip, job.view, job.pixel, job.scale)
+        if _key in self.line_cache:
+            self.line_cache.move_to_end(_key)
+            clines, _culled, _ = self.line_cache[_key]
+            job.culled += _culled
+            job.cached += 1
+            return list(clines)
+        _culled = job.culled
+        clines = self.calc_lines(_ttr, job, cancelled)
+        # incomplete lines of a cancelled job are not kept
+        if cancelled is not None and cancelled():
+            return clines
+        _size = 64 * len(clines) + sum(_l.nbytes for _l in clines if _l is not None)
+        _limit = self.plo.cont_cache_mb * 2**20
+        if _size <= _limit:
+            self.line_cache[_key] = (clines, job.culled - _culled, _size)
+            self.line_cache_size += _size
+            while self.line_cache_size > _limit:
+                _, (_, _, _s) = self.line_cache.popitem(last=False)
+                self.line_cache_size -= _s
+        return list(clines)
+
+    def calc_lines(self, _ttr, job, cancelled=None):
+        # calculate the contour lines for an array of 2-theta values [rad]
+        # returns a list of (N,2) arrays [x, y] or None if the contour
+        # is out of bounds, contour lines are interrupted by NaN
+        # - conic: the cone intersecting the detector plane is a conic
+        #          section (ellipse, parabola, hyperbola), it is
+        #          calculated directly and sampled by azimuth
+        # - contour: build a cone on a grid for every 2-theta value and
+        #            use contourpy to find the intersection (reference)
+        # - grid: calculate 2-theta once on a grid of the detector plane
+        #         and use contourpy to extract all levels at once
+        geo = job.geo
+        clines = [None] * len(_ttr)
+        # skip contours outside of the visible detector area
+        _vis = np.zeros(len(_ttr), dtype=bool)
+        if job.view[0] < job.view[1] and job.view[2] < job.view[3]:
+            _tth_min, _tth_max = calc_tth_range(job.view, geo.rota, geo.tilt, geo.xoff, geo.yoff, geo.dist)
+            _vis = (np.rad2deg(_ttr) >= _tth_min) & (np.rad2deg(_ttr) <= _tth_max)
+        job.culled += int(np.count_nonzero(~_vis))
+        _idx = np.flatnonzero(_vis)
+        if len(_idx) == 0:
+            return clines
+        elif self.plo.cont_engine == 'contour':
+            _lines = []
+            for _t in np.asarray(_ttr)[_idx]:
+                if cancelled is not None and cancelled():
+                    break
+                _lines.append(self.calc_contour_cone(_t, geo, job.view, job.scale, job.stages))
+        elif self.plo.cont_engine == 'grid':
+            _lines = self.calc_contour_grid(np.asarray(_ttr)[_idx], geo, job.view, job.scale, job.stages)
+        elif job.pixel is not None:
+            # zoom dependent: only the visible part at screen resolution
+            with trace_stage(job.stages, 'conic'):
+                _lines = calc_conic_view(np.asarray(_ttr)[_idx], geo.rota, geo.tilt, geo.xoff, geo.yoff, geo.dist,
+                                         job.view, job.pixel, self.plo.cont_conic_px / job.scale)
+        else:
+            with trace_stage(job.stages, 'conic'):
+                _steps = max(int(self.plo.cont_conic_num * job.scale), 16)
+                X, Y = calc_conic(np.asarray(_ttr)[_idx], geo.rota, geo.tilt, geo.xoff, geo.yoff, geo.dist, _steps)
+                _lines = [None if np.isnan(_x).all() else np.column_stack([_x, _y]) for _x, _y in zip(X, Y)]
+        for _n, _l in zip(_idx, _lines):
+            clines[_n] = clip_lines(_l, job.clip)
+        return clines
+
+    def calc_heatmap(self, job):
+        # heatmap of the module area within job.view, one map pixel
+        # per job.heat_step screen pixels (job.pixel)
+        # the maps don't depend on the energy, q and d are
+        # rescaled from sin(theta) when drawn, see calc_grid_maps()
+        # returns a dict, cached per geometry and grid
+        #  rect (x0, x1, y0, y1): outline of the map
+        #  sin: sin(theta), NaN outside of the modules
+        #  omega: solid angle of a detector pixel [sr], NaN outside
+        #  sin_lim, omega_lim: 2nd and 98th percentile on the modules
+        geo = job.geo
+        _x0, _x1, _y0, _y1 = job.view
+        # lower resolution for previews, never above the screen
+        _step = job.heat_step / min(job.scale, 1.0)
+        _w = int(np.clip(np.ceil((_x1-_x0) / (job.pixel[0]*_step)), 1, 4096))
+        _h = int(np.clip(np.ceil((_y1-_y0) / (job.pixel[1]*_step)), 1, 4096))
+        _key = (geo.rota, geo.tilt, geo.xoff, geo.yoff, geo.dist, job.view, _w, _h)
+        if _key in self.heat_cache:
+            self.heat_cache.move_to_end(_key)
+            return self.heat_cache[_key]
+        # map pixel centers
+        X = _x0 + (np.arange(_w) + 0.5) * (_x1-_x0) / _w
+        Y = _y0 + (np.arange(_h) + 0.5) * (_y1-_y0) / _h
+        # at lambda = 1 A (12.398 keV) sin(theta)/lambda is sin(theta)
+        _geo = copy.copy(geo)
+        _geo.ener = 12.398
+        heat = calc_grid_maps(X, Y, _geo, self.det, ('stl', 'omega'))
+        heat = {'sin':heat['stl'], 'omega':np.array(heat['omega'])}
+        # the modules, the columns and rows are sorted
+        _on = np.zeros((_h, _w), dtype=bool)
+        for _mx, _my, _mw, _mh in calc_modules(self.det):
+            _on[np.searchsorted(Y, _my):np.searchsorted(Y, _my+_mh, 'right'),
+                np.searchsorted(X, _mx):np.searchsorted(X, _mx+_mw, 'right')] = True
+        for _k in ('sin', 'omega'):
+            _lim = np.percentile(heat[_k][_on], (2, 98)) if _on.any() else (0.0, 1.0)
+            heat[_k] = np.where(_on, heat[_k], np.nan).astype(np.float32)
+            heat[f'{_k}_lim'] = tuple(float(_l) for _l in _lim)
+        heat['rect'] = job.view
+        self.heat_cache[_key] = heat
+        if len(self.heat_cache) > self.plo.heat_cache:
+            self.heat_cache.popitem(last=False)
+        return heat
+
+    def calc_contour_grid(self, _ttr, geo, rect, scale, stages=None):
+        # the 2-theta grid only depends on the geometry, the contour
+        # generator is shared by all levels (geometry and reference)
+        # and only rebuilt if the geometry changed
+        # - stages: render stage timing, see trace_stage()
+        _res = max(int(self.plo.cont_reso_max * scale), 8)
+        _key = (geo.rota, geo.tilt, geo.xoff, geo.yoff, geo.dist, rect, _res)
+        if self.grid_gen is None or self.grid_gen[0] != _key:
+            # grid covers the rectangle rect (x0, x1, y0, y1),
+            # the larger side gets plo.cont_reso_max * scale steps
+            _x0, _x1, _y0, _y1 = rect
+            _scale = _res / max(_x1-_x0, _y1-_y0)
+            _x = np.linspace(_x0, _x1, max(int((_x1-_x0)*_scale), 2))
+            _y = np.linspace(_y0, _y1, max(int((_y1-_y0)*_scale), 2))
+            from contourpy import contour_generator
+            with trace_stage(stages, 'grid'):
+                X, Y = np.meshgrid(_x, _y)
+                Z = calc_tth(X, Y, geo.rota, geo.tilt, geo.xoff, geo.yoff, geo.dist)
+            with trace_stage(stages, 'contourpy'):
+                self.grid_gen = (_key, contour_generator(x=_x, y=_y, z=Z))
+        with trace_stage(stages, 'contourpy'):
+            return [join_segments(_segs) for _segs in self.grid_gen[1].multi_lines(np.rad2deg(_ttr))]
+
+    def calc_contour_cone(self, _ttr, geo, rect, scale, stages=None):
+        # the cone is sampled on a grid in the frame of the sample
+        # and intersected with the detector plane by contourpy
+        # the grid covers the rectangle rect (x0, x1, y0, y1) of the
+        # detector plane, see calc_tth() for the transformation,
+        # it is linear and the corners give the extent of the grid
+        # - stages: render stage timing, see trace_stage()
+        a = np.deg2rad(geo.tilt) + np.deg2rad(geo.rota)
+        comp = np.deg2rad(geo.tilt) * geo.dist
+        _gx = (np.array(rect[2:]) - comp + geo.yoff)*np.cos(a) + geo.dist*np.sin(a)
+        _gy = np.array(rect[:2]) - geo.xoff
+        # calculate ratio of sample to detector distance (sdd)
+        # and contour distance to beam center (cbc)
+        # _rat = sdd/cbc = 1/tan(2-theta)
+        # this is used to scale the cones Z dimension
+        _rat = 1/np.tan(_ttr)
+        # apply the min/max grid resolution
+        _grd_res = max(min(int(self.plo.cont_reso_min*_rat), self.plo.cont_reso_max), self.plo.cont_reso_min)
+        # level of detail
+        _grd_res = max(int(_grd_res * scale), 8)
+        # prepare the grid for the cones/contours
+        # adjust the resolution using i (-> plo.cont_levels),
+        # as smaller cones/contours (large i) need higher sampling
+        # but make sure the sampling rate doesn't fall below the
+        # user set plo.cont_reso_min value and plo.cont_reso_max
+        # prevents large numbers that will take seconds to draw
+        # add a step on both sides, the contour is clipped to rect
+        _pad = np.array([-1, 1]) / (_grd_res - 3)
+        _x1 = np.linspace(*(np.sort(_gx) + _pad*np.ptp(_gx)), _grd_res)
+        _x2 = np.linspace(*(np.sort(_gy) + _pad*np.ptp(_gy)), _grd_res)
+        # draw contours for the tilted/rotated/moved geometry
+        # use the offset adjusted value x1 to prepare the grid
+        # the grid lives in buffers that are reused across levels and frames
+        with trace_stage(stages, 'grid'):
+            X0, Y0, Z0, X, Y, Z = self.get_cone_buffers(_grd_res)
+            X0[:] = _x1[None,:]
+            Y0[:] = _x2[:,None]
+            np.hypot(X0, Y0, out=Z0)
+            Z0 *= _rat
+        with trace_stage(stages, 'calc_cone'):
+            self.calc_cone(X0, Y0, Z0, geo.rota, geo.tilt, geo.xoff, geo.yoff, geo.dist, out=(X, Y, Z))
+        # make sure Z is large enough to draw the contour
+        if np.max(Z) < geo.dist:
+            return None
+        from contourpy import contour_generator
+        with trace_stage(stages, 'contourpy'):
+            return join_segments(contour_generator(x=X, y=Y, z=Z).lines(geo.dist))
+
+    def get_cone_buffers(self, res):
+        # six (res, res) views on a buffer sized for plo.cont_reso_max
+        # (grid: X0, Y0, Z0 and cone: X, Y, Z), reallocated only if the
+        # maximum resolution or the precision changes
+        _dtype = np.float32 if self.plo.cont_float32 else np.float64
+        _size = max(res, self.plo.cont_reso_max)**2
+        _buf = self.cone_buffer
+        if _buf is None or _buf.dtype != _dtype or _buf.shape[1] < _size:
+            _buf = np.empty((6, _size), dtype=_dtype)
+            self.cone_buffer = _buf
+        return [_b[:res*res].reshape(res, res) for _b in _buf]
+
+    def get_rotation(self, rota, tilt):
+        # rotation matrix for the combined rotation and tilt
+        # cached per (rota, tilt), there are only so many slider positions
+        _key = (rota, tilt)
+        if _key not in self.rot_cache:
+            a = np.deg2rad(tilt) + np.deg2rad(rota)
+            self.rot_cache[_key] = np.array([[np.cos(a), 0, np.sin(a)],[0,1,0],[-np.sin(a), 0, np.cos(a)]])
+        return self.rot_cache[_key]
+
+    def calc_cone(self, X, Y, Z, rota, tilt, xoff, yoff, dist, out=None):
+        # combined rotation, tilt 'movement' is compensated
+        # rotate the sample around y
+        m = self.get_rotation(rota, tilt)
+        # compensate for tilt not rotating
+        # - revert the travel distance
+        comp = np.deg2rad(tilt) * dist
+        # the results are written to out (3 arrays shaped like X),
+        # the inputs are not modified and must not be part of out
+        if out is None:
+            out = np.empty((3,) + np.shape(X), dtype=np.result_type(X, Y, Z))
+        _X, _Y, _Z = out
+        # apply rotation, [X,Y,Z] . m
+        # _Z is used as temporary storage for Z * m[2,0]
+        np.multiply(X, m[0,0], out=_Y)
+        np.multiply(Z, m[2,0], out=_Z)
+        _Y += _Z
+        _Y += comp - yoff
+        # _X is used as temporary storage for Z * m[2,2]
+        np.multiply(X, m[0,2], out=_Z)
+        np.multiply(Z, m[2,2], out=_X)
+        _Z += _X
+        # Y is not rotated
+        np.add(Y, xoff, out=_X)
+        return _X, _Y, _Z
+
+class ReferenceStore(object):
+    # d spacings of the pyFAI library references
+    # - names and d spacings are read from the calibrant index
+    #   (see compile_calibrants()), memory mapped, no parsing
+    # - calibrants missing in the index are read from pyFAI, once,
+    #   and kept as a compact array
+    # - the least recently used pyFAI references are dropped beyond size
+    def __init__(self, size, index=None):
+        self.size = size
+        self.data = collections.OrderedDict()
+        self.library = None
+        # the pyFAI names are merged into the index names, see names()
+        self.merged = False
+        self.index = None
+        if index is not None and os.path.exists(index):
+            self.index = np.load(index, mmap_mode='r')
+            self.index_pos = {str(_n):_i for _i, _n in enumerate(self.index['names'])}
+            self.library = list(self.index_pos)
+
+    def names(self, full=False):
+        # names of the calibrants, imports pyFAI without index
+        # - full: add the calibrants of pyFAI missing in the index,
+        #         e.g. of a newer pyFAI, imports pyFAI once
+        if self.library is None:
+            from pyFAI import calibrant
+            self.library = calibrant.names()
+            self.merged = True
+        elif full and not self.merged:
+            self.merged = True
+            try:
+                from pyFAI import calibrant
+            except ImportError:
+                return self.library
+            _known = set(self.library)
+            self.library = self.library + [_n for _n in calibrant.names() if _n not in _known]
+        return self.library
+
+    def get(self, name):
+        if self.index is not None and name in self.index_pos:
+            _i = self.index_pos[name]
+            _off = self.index['offsets']
+            return self.index['dsp'][_off[_i]:_off[_i+1]]
+        if name in self.data:
+            self.data.move_to_end(name)
+        else:
+            from pyFAI import calibrant
+            self.data[name] = np.asarray(calibrant.get_calibrant(name).get_dSpacing(), dtype=np.float32)
+            if len(self.data) > self.size:
+                self.data.popitem(last=False)
+        return self.data[name]
+
+    @staticmethod
+    def calc_tth(dsp, ener):
+        # convert d spacings to 2-theta [rad] at energy ener [keV]
+        # lambda = 2 * d * sin(theta)
+        # 2-theta = 2 * (lambda / 2*d)
+        # lambda -> (12.398/geo_energy)
+        lambda_d = (12.398/ener) / (2*np.asarray(dsp, dtype=float))
+        # d spacings that are not reachable at this energy (lambda_d > 1.0)
+        # or unset (d = -1, lambda_d < 0) are NaN
+        _valid = (lambda_d > 0.0) & (lambda_d <= 1.0)
+        _ttr = np.full(lambda_d.shape, np.nan)
+        _ttr[_valid] = 2 * np.arcsin(lambda_d[_valid])
+        return _ttr
+
+def merge_rings(ttr, idx, tol):
+    # rings of several references at 2-theta ttr [rad] (NaN: not
+    # reachable) and their reference index idx, rings closer than
+    # tol [rad] are merged and drawn once, by the lowest index
+    # returns 2-theta (ascending) and reference index of the rings
+    _fin = np.isfinite(ttr)
+    _ord = np.argsort(ttr[_fin], kind='stable')
+    ttr, idx = ttr[_fin][_ord], idx[_fin][_ord]
+    if tol <= 0 or len(ttr) < 2:
+        return ttr, idx
+    # a group starts at a ring and ends before the first ring
+    # tol beyond it, the loop runs once per drawn ring
+    _end = np.searchsorted(ttr, ttr + tol, side='left')
+    _start = [0]
+    while _end[_start[-1]] < len(ttr):
+        _start.append(_end[_start[-1]])
+    return ttr[_start], np.minimum.reduceat(idx, _start)
+
+def compile_calibrants(save_as, dmin=0.0):
+    # compile the d spacings (d >= dmin) of all pyFAI calibrants
+    # into a single file (.npy) holding one record
+    #  names (n,):     calibrant names
+    #  offsets (n+1,): calibrant i: dsp[offsets[i]:offsets[i+1]]
+    #  dsp (m,):       d spacings [A], float32
+    # load with np.load(save_as, mmap_mode='r'), see ReferenceStore
+    from pyFAI import calibrant
+    names = calibrant.names()
+    dsp = []
+    for name in names:
+        _dsp = np.asarray(calibrant.get_calibrant(name).get_dSpacing(), dtype=np.float32)
+        dsp.append(_dsp[_dsp >= dmin])
+    offsets = np.cumsum([0] + [len(_d) for _d in dsp])
+    _len = max(len(_n) for _n in names)
+    rec = np.zeros((), dtype=[('names', f'U{_len}', (len(names),)),
+                              ('offsets', np.int64, (len(offsets),)),
+                              ('dsp', np.float32, (offsets[-1],))])
+    rec['names'] = names
+    rec['offsets'] = offsets
+    rec['dsp'] = np.concatenate(dsp)
+    np.save(save_as, rec)
+
+# geometry parameters of a batch, in this order
+batch_pars = ('ener', 'dist', 'rota', 'tilt', 'xoff', 'yoff')
+
+def get_batch(pars, geo):
+    # geometry parameters as (N,6) array, columns: batch_pars
+    # pars: dict of arrays/lists, list of dicts or (N,6) array
+    # missing parameters are taken from geo
+    if isinstance(pars, dict):
+        _num = max([np.size(_v) for _v in pars.values()] + [1])
+        return np.column_stack([np.broadcast_to(np.asarray(pars.get(_p, getattr(geo, _p)), dtype=float), (_num,)) for _p in batch_pars])
+    elif isinstance(pars, (list, tuple)) and len(pars) > 0 and isinstance(pars[0], dict):
+        return np.array([[_d.get(_p, getattr(geo, _p)) for _p in batch_pars] for _d in pars], dtype=float)
+    return np.atleast_2d(np.asarray(pars, dtype=float))
+
+def calc_batch(pars, det, plo, lines=False):
+    # evaluate many geometries at once
+    # - pars: (N,6) array of geometries, columns: batch_pars
+    # - lines: also calculate the contour lines (plo.cont_levels)
+    # returns a dict of (N,) arrays
+    #  tth_min/tth_max [deg]: 2-theta range on the detector
+    #  dsp_min [A], q_max [1/A]: resolution at the detector edge
+    #  beam_x/beam_y [mm], beam_on_det: primary beam position
+    #  rings: number of 2-theta levels on the detector
+    #  and with lines=True, 'lines': list (N) of lists (levels) of
+    #  (M,2) arrays or None
+    pars = np.atleast_2d(np.asarray(pars, dtype=float))
+    ener, dist, rota, tilt, xoff, yoff = pars.T
+    xdim, ydim = calc_det_dims(det)
+    rect = (-xdim, xdim, -ydim, ydim)
+    res = dict()
+    # vectorized over all geometries
+    res['tth_min'], res['tth_max'] = calc_tth_range(rect, rota, tilt, xoff, yoff, dist)
+    # Conversion factor keV to Angstrom: 12.398
+    _stl = np.sin(np.deg2rad(res['tth_max'])/2)/(12.398/ener)
+    with np.errstate(divide='ignore'):
+        res['dsp_min'] = 1/(2*_stl)
+    res['q_max'] = _stl*4*np.pi
+    res['beam_x'], res['beam_y'], _cos = calc_beam_center(rota, tilt, xoff, yoff, dist)
+    res['beam_on_det'] = (np.abs(res['beam_x']) <= xdim) & (np.abs(res['beam_y']) <= ydim) & (_cos > 0)
+    levels = np.linspace(plo.cont_tth_min, plo.cont_tth_max, plo.cont_tth_num)
+    res['rings'] = np.count_nonzero((levels >= res['tth_min'][:,None]) & (levels <= res['tth_max'][:,None]), axis=1)
+    if lines:
+        engine = ContourEngine(plo, det)
+        geo = container()
+        res['lines'] = []
+        for _p in pars:
+            for _name, _val in zip(batch_pars, _p):
+                setattr(geo, _name, _val)
+            job = engine.get_job(geo, exp_ttr=np.deg2rad(levels))
+            res['lines'].append(engine.calc_job(job).exp)
+    return res
+
+def calc_coverage(pars, det, tth=None, steps=360):
+    # ring coverage of the geometries pars (N,6), columns: batch_pars
+    # - tth: 2-theta of the rings [deg], default: 0.5 degree steps
+    # - steps: azimuthal samples per ring
+    # the rings don't depend on the energy, only their d spacing,
+    # every distinct geometry is calculated once
+    # returns a dict
+    #  tth (T,): 2-theta of the rings [deg]
+    #  frac (N,T): fraction of the ring (azimuth) on active module area
+    #  full (N,T): ring completely on the detector (gaps included)
+    #  dsp_full (N,): minimum d spacing of a complete ring [A]
+    #  dsp_part (N,): minimum d spacing on active module area [A]
+    pars = np.atleast_2d(np.asarray(pars, dtype=float))
+    tth = np.arange(0.5, 180, 0.5) if tth is None else np.asarray(tth, dtype=float)
+    _geos, _inv = np.unique(pars[:,1:], axis=0, return_inverse=True)
+    _inv = _inv.ravel()
+    xdim, ydim = calc_det_dims(det)
+    _mods = calc_modules(det)
+    _mx0, _my0, _mw, _mh = _mods.T
+    _mx1, _my1 = _mx0 + _mw, _my0 + _mh
+    # without central hole the modules are columns x rows, a point is
+    # on a module if it is within the edges of a column and a row
+    # (odd index in the sorted edges)
+    _edges = None
+    if det.cbh == 0:
+        _edges = [np.unique(np.column_stack([_mx0, _mx1]), axis=0).ravel(), np.unique(np.column_stack([_my0, _my1]), axis=0).ravel()]
+        # touching modules (no gap) are tested one by one
+        if not all(np.all(np.diff(_e) > 0) for _e in _edges):
+            _edges = None
+    # rings outside of the detector are skipped
+    _tth_min, _tth_max = calc_tth_range((-xdim, xdim, -ydim, ydim), *_geos[:,[1,2,3,4,0]].T)
+    frac = np.zeros((len(_geos), len(tth)))
+    full = np.zeros((len(_geos), len(tth)), dtype=bool)
+    for _n, (dist, rota, tilt, xoff, yoff) in enumerate(_geos):
+        _idx = np.flatnonzero((tth >= _tth_min[_n]) & (tth <= _tth_max[_n]))
+        if len(_idx) == 0:
+            continue
+        # (rings, azimuth), the last azimuth repeats the first
+        X, Y = calc_conic(np.deg2rad(tth[_idx]), rota, tilt, xoff, yoff, dist, steps+1)
+        X, Y = X[:,:-1], Y[:,:-1]
+        with np.errstate(invalid='ignore'):
+            if _edges is not None:
+                _on = (np.searchsorted(_edges[0], X) % 2 == 1) & (np.searchsorted(_edges[1], Y) % 2 == 1)
+            else:
+                _on = np.zeros(X.shape, dtype=bool)
+                for _i in range(len(_mx0)):
+                    _on |= (X >= _mx0[_i]) & (X <= _mx1[_i]) & (Y >= _my0[_i]) & (Y <= _my1[_i])
+            full[_n,_idx] = ((np.abs(X) <= xdim) & (np.abs(Y) <= ydim)).all(axis=1)
+        frac[_n,_idx] = _on.mean(axis=1)
+    res = dict(tth=tth, frac=frac[_inv], full=full[_inv])
+    # largest 2-theta of a complete / partially covered ring
+    _tth_full = np.where(res['full'], tth, np.nan)
+    _tth_part = np.where(res['frac'] > 0, tth, np.nan)
+    with np.errstate(invalid='ignore'):
+        for _key, _tth in (('dsp_full', _tth_full), ('dsp_part', _tth_part)):
+            _max = np.full(len(pars), np.nan)
+            _any = np.isfinite(_tth).any(axis=1)
+            _max[_any] = np.nanmax(_tth[_any], axis=1)
+            # Conversion factor keV to Angstrom: 12.398
+            res[_key] = (12.398/pars[:,0]) / (2*np.sin(np.deg2rad(_max)/2))
+    return res
+
+def get_sweep(geo, lmt, axes, num=None):
+    # grid over the lmt ranges of the parameters axes, e.g. ('ener', 'dist')
+    # - num: points per axis, default: lmt step size
+    # the other parameters are taken from geo
+    # returns the grid values per axis and the geometries (N,6)
+    vals = []
+    for _p in axes:
+        _min, _max, _stp = [getattr(lmt, f'{_p}_{_s}') for _s in ('min', 'max', 'stp')]
+        if num is None:
+            vals.append(np.arange(_min, _max + _stp/2, _stp))
+        else:
+            vals.append(np.linspace(_min, _max, num))
+    _mesh = np.meshgrid(*vals, indexing='ij')
+    pars = np.column_stack([_mesh[axes.index(_p)].ravel() if _p in axes else np.full(_mesh[0].size, getattr(geo, _p)) for _p in batch_pars])
+    return vals, pars
+
+def calc_sweep(geo, lmt, det, axes, num=None, workers=0, tth=None, steps=360):
+    # resolution coverage on a grid over the lmt ranges of axes
+    # the geometries are split into chunks and calculated by a
+    # pool of workers (processes), workers=0: number of CPUs
+    # returns calc_coverage() results shaped like the grid and
+    # the grid values per axis (axes, vals)
+    vals, pars = get_sweep(geo, lmt, axes, num)
+    # energy only changes the d spacing, chunk the distinct geometries
+    _geos, _inv = np.unique(pars[:,1:], axis=0, return_inverse=True)
+    _geos = np.column_stack([np.ones(len(_geos)), _geos])
+    workers = workers if workers > 0 else (os.cpu_count() or 1)
+    _chunks = np.array_split(_geos, min(workers*4, len(_geos)))
+    if workers == 1 or len(_chunks) == 1:
+        _res = [calc_coverage(_c, det, tth, steps) for _c in _chunks]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        # spawn: fresh processes, a fork would copy the threads (Qt) of the caller
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            _res = list(pool.map(calc_coverage, _chunks, [det]*len(_chunks), [tth]*len(_chunks), [steps]*len(_chunks)))
+    res = dict(axes=np.array(axes), tth=_res[0]['tth'])
+    _shape = tuple(len(_v) for _v in vals)
+    for _n, _p in enumerate(axes):
+        res[_p] = vals[_n]
+    res['frac'] = np.concatenate([_r['frac'] for _r in _res])[_inv.ravel()].reshape(_shape + (-1,))
+    res['full'] = np.concatenate([_r['full'] for _r in _res])[_inv.ravel()].reshape(_shape + (-1,))
+    # d spacing of the 2-theta at the energy of each point (d at 1 keV / energy)
+    for _key in ('dsp_full', 'dsp_part'):
+        res[_key] = (np.concatenate([_r[_key] for _r in _res])[_inv.ravel()] / pars[:,0]).reshape(_shape)
+    return res
+
+def save_sweep(save_as, res):
+    # export a calc_sweep() result, .npz: everything
+    # .csv: grid values, dsp_full and dsp_part per point
+    if os.path.splitext(save_as)[1] == '.npz':
+        np.savez(save_as, **res)
+        return
+    axes = [str(_p) for _p in res['axes']]
+    _mesh = np.meshgrid(*[res[_p] for _p in axes], indexing='ij')
+    _data = np.column_stack([_m.ravel() for _m in _mesh] + [res['dsp_full'].ravel(), res['dsp_part'].ravel()])
+    np.savetxt(save_as, _data, delimiter=',', header=','.join(axes + ['dsp_full', 'dsp_part']), comments='', fmt='%.6g')
+
+# per pixel maps, see calc_pixels()
+#  tth [deg], azim [deg], q [1/A], dsp [A], omega (solid angle) [sr]
+pixel_maps = ('tth', 'azim', 'q', 'dsp', 'omega')
+
+def calc_pixel_size(det):
+    # pixels per module (vertical, horizontal)
+    return int(round(det.vms/det.pxs)), int(round(det.hms/det.pxs))
+
+def calc_pixels(geo, det, module, rows=None, maps=pixel_maps):
+    # per pixel maps of a module (x, y, width, height), see calc_modules()
+    # - rows: slice of the pixel rows, default: all
+    # returns a dict of (rows, columns) float64 arrays, rows run
+    # along y and columns along x, pixel centers are at
+    #  x + (column + 0.5) * pxs, y + (row + 0.5) * pxs
+    vpix, hpix = calc_pixel_size(det)
+    rows = slice(0, vpix) if rows is None else rows
+    X = module[0] + (np.arange(hpix) + 0.5) * det.pxs
+    Y = module[1] + (np.arange(vpix)[rows] + 0.5) * det.pxs
+    return calc_grid_maps(X, Y, geo, det, maps)
+
+def calc_grid_maps(X, Y, geo, det, maps=pixel_maps):
+    # per pixel maps on the grid of the plot positions X (columns)
+    # and Y (rows), the solid angle is the one of a detector pixel
+    # maps: pixel_maps and stl, sin(theta)/lambda [1/A]
+    # returns a dict of (rows, columns) float64 arrays
+    a = np.deg2rad(geo.tilt) + np.deg2rad(geo.rota)
+    comp = np.deg2rad(geo.tilt) * geo.dist
+    # back to the rotated frame, see calc_tth()
+    # the pixel is at _x * (cos(a), 0, -sin(a)) + _y * (0, 1, 0)
+    #  + dist * (sin(a), 0, cos(a)), the last one is the plane normal
+    _x = (np.asarray(Y) - comp + geo.yoff)[:,None]
+    _y = (np.asarray(X) - geo.xoff)[None,:]
+    X0 = _x*np.cos(a) + geo.dist*np.sin(a)
+    Z0 = geo.dist*np.cos(a) - _x*np.sin(a)
+    _tth = np.arctan2(np.hypot(X0, _y), Z0)
+    # Conversion factor keV to Angstrom: 12.398
+    _stl = np.sin(_tth/2) / (12.398/geo.ener)
+    res = dict()
+    if 'tth' in maps:
+        res['tth'] = np.rad2deg(_tth)
+    if 'azim' in maps:
+        # same azimuth as calc_conic()
+        res['azim'] = np.rad2deg(np.arctan2(_y, X0))
+    if 'stl' in maps:
+        res['stl'] = _stl
+    if 'q' in maps:
+        res['q'] = _stl*4*np.pi
+    if 'dsp' in maps:
+        with np.errstate(divide='ignore'):
+            res['dsp'] = 1/(2*_stl)
+    if 'omega' in maps:
+        # pixel area * cos(incidence) / r^2, cos(incidence) = dist / r
+        res['omega'] = np.broadcast_to(det.pxs**2 * geo.dist / (_x**2 + _y**2 + geo.dist**2)**1.5, _tth.shape)
+    return res
+
+def calc_pixel_maps(geo, det, save_as=None, maps=pixel_maps, dtype=np.float32, chunk=2**20):
+    # per pixel maps of the whole detector, see calc_pixels()
+    # the maps are (modules, vpix, hpix) arrays of the modules of
+    # calc_modules(), gaps and the central hole have no pixels
+    # the modules are calculated in blocks of rows, at most chunk
+    # pixels at a time, the maps are written directly to
+    # - None: arrays in memory
+    # - .npy: one file per map (save_as '_' map name '.npy'), the
+    #         files are memory mapped, returned in mode 'r'
+    # - .npz: one uncompressed member per map and 'modules' [mm],
+    #         the members are written one after another
+    # returns a dict of maps (.npz: lazy np.load())
+    modules = calc_modules(det)
+    vpix, hpix = calc_pixel_size(det)
+    shape = (len(modules), vpix, hpix)
+    dtype = np.dtype(dtype)
+    _rows = max(1, chunk // hpix)
+    _blocks = [(_n, slice(_r, min(_r + _rows, vpix))) for _n in range(len(modules)) for _r in range(0, vpix, _rows)]
+    if save_as is not None and os.path.splitext(save_as)[1] == '.npz':
+        # stream map by map, a map is never held in memory
+        # numpy reads the members like .npy files
+        _head = {'descr':np.lib.format.dtype_to_descr(dtype), 'fortran_order':False, 'shape':shape}
+        with zipfile.ZipFile(save_as, 'w', zipfile.ZIP_STORED, allowZip64=True) as zf:
+            for _m in maps:
+                with zf.open(f'{_m}.npy', 'w', force_zip64=True) as wf:
+                    np.lib.format.write_array_header_1_0(wf, _head)
+                    for _n, _r in _blocks:
+                        wf.write(calc_pixels(geo, det, modules[_n], _r, (_m,))[_m].astype(dtype).tobytes())
+            with zf.open('modules.npy', 'w') as wf:
+                np.lib.format.write_array(wf, modules)
+        return np.load(save_as)
+    if save_as is None:
+        res = {_m:np.empty(shape, dtype=dtype) for _m in maps}
+    else:
+        _root = os.path.splitext(save_as)[0]
+        res = {_m:np.lib.format.open_memmap(f'{_root}_{_m}.npy', mode='w+', dtype=dtype, shape=shape) for _m in maps}
+    for _n, _r in _blocks:
+        for _m, _v in calc_pixels(geo, det, modules[_n], _r, maps).items():
+            res[_m][_n,_r] = _v
+    if save_as is not None:
+        for _m in maps:
+            res[_m].flush()
+            del res[_m]
+            res[_m] = np.load(f'{_root}_{_m}.npy', mmap_mode='r')
+    return res
+
+def read_batch(fpath, geo):
+    # read geometries from a parameter file
+    # - .json: list of dicts or dict of lists
+    # - .csv/.txt: columns with a header line, e.g. ener,dist,yoff
+    if os.path.splitext(fpath)[1] == '.json':
+        with open(fpath, 'r') as of:
+            return get_batch(json.load(of), geo)
+    _delim = ',' if os.path.splitext(fpath)[1] == '.csv' else None
+    _data = np.atleast_1d(np.genfromtxt(fpath, names=True, delimiter=_delim))
+    return get_batch({_n:_data[_n] for _n in _data.dtype.names}, geo)
+
+def split_lines(clines):
+    # contour line to list of segments (NaN interrupted) for json
+    if clines is None:
+        return []
+    _fin = np.isfinite(clines[:,0])
+    _brk = np.flatnonzero(np.diff(_fin.astype(int)) != 0) + 1
+    return [_s.round(3).tolist() for _s in np.split(clines, _brk) if np.isfinite(_s[:,0]).all()]
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate detector geometries without GUI.')
+    parser.add_argument('pars', nargs='?', help='parameter file (.json, .csv, .txt), parameters: ' + ', '.join(batch_pars))
+    parser.add_argument('-o', '--out', default=None, help='output file (.jsonl or .npz), default: stdout (json lines)')
+    parser.add_argument('--sweep', nargs='+', default=None, choices=batch_pars, metavar='PAR', help='resolution coverage on a grid over the limits of PAR, e.g. ener dist (output: .npz or .csv)')
+    parser.add_argument('--num', type=int, default=None, help='sweep points per axis, default: plo.sweep_num')
+    parser.add_argument('--workers', type=int, default=None, help='sweep worker processes, default: plo.sweep_workers')
+    parser.add_argument('--maps', default=None, metavar='FILE', help='per pixel maps of the settings geometry (.npz or .npy: one file per map)')
+    parser.add_argument('--map-names', nargs='+', default=list(pixel_maps), choices=pixel_maps, metavar='MAP', help='maps to calculate: ' + ', '.join(pixel_maps))
+    parser.add_argument('--calibrants', default=None, metavar='FILE', help='compile the pyFAI calibrants into FILE (.npy), e.g. calibrants.npy')
+    parser.add_argument('--dmin', type=float, default=0.0, help='smallest d spacing of the compiled calibrants [A]')
+    parser.add_argument('-d', '--det', nargs=2, default=None, metavar=('TYPE', 'SIZE'), help='detector, e.g. EIGER2 4M')
+    parser.add_argument('-s', '--settings', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'settings.json'), help='settings file')
+    parser.add_argument('-l', '--lines', action='store_true', help='include the contour lines')
+    parser.add_argument('-c', '--chunk', type=int, default=1024, help='geometries per chunk')
+    args = parser.parse_args()
+
+    if args.calibrants is not None:
+        compile_calibrants(args.calibrants, args.dmin)
+        return
+
+    geo, plo, lmt = get_specs_geo(), get_specs_plo(), get_specs_lmt()
+    if os.path.exists(args.settings):
+        load_par(args.settings, geo, plo, lmt)
+    det_type, det_size = args.det if args.det is not None else (geo.det_type, geo.det_size)
+    det = get_specs_det(get_det_library(os.path.dirname(os.path.abspath(args.settings))), det_type, det_size)
+
+    if args.maps is not None:
+        calc_pixel_maps(geo, det, args.maps, args.map_names)
+        return
+    if args.sweep is not None:
+        if args.out is None:
+            parser.error('--sweep needs an output file (-o)')
+        _num = args.num if args.num is not None else plo.sweep_num
+        _workers = args.workers if args.workers is not None else plo.sweep_workers
+        save_sweep(args.out, calc_sweep(geo, lmt, det, args.sweep, _num, _workers))
+        return
+    if args.pars is None:
+        parser.error('a parameter file or --sweep is needed')
+    pars = read_batch(args.pars, geo)
+
+    if args.out is not None and os.path.splitext(args.out)[1] == '.npz':
+        # collect everything, lines are stored flat:
+        #  lines_xy: (M,2) NaN interrupted, lines_off: start per (geometry, level)
+        res = collections.defaultdict(list)
+        for _i in range(0, len(pars), args.chunk):
+            for _k, _v in calc_batch(pars[_i:_i+args.chunk], det, plo, args.lines).items():
+                res[_k].extend(_v)
+        out = {_k:np.asarray(_v) for _k, _v in res.items() if _k != 'lines'}
+        if args.lines:
+            _flat = [np.zeros((0,2)) if _l is None else _l for _g in res['lines'] for _l in _g]
+            out['lines_off'] = np.cumsum([0] + [len(_l) for _l in _flat])
+            out['lines_xy'] = np.concatenate(_flat).astype(np.float32)
+        np.savez(args.out, pars=pars, par_names=np.array(batch_pars), **out)
+        return
+
+    # stream json lines
+    wf = sys.stdout if args.out is None else open(args.out, 'w')
+    try:
+        for _i in range(0, len(pars), args.chunk):
+            res = calc_batch(pars[_i:_i+args.chunk], det, plo, args.lines)
+            for _n, _p in enumerate(pars[_i:_i+args.chunk]):
+                _line = dict(zip(batch_pars, _p.tolist()))
+                _line.update({_k:_v[_n].item() for _k, _v in res.items() if _k != 'lines'})
+                if args.lines:
+                    _line['lines'] = [split_lines(_l) for _l in res['lines'][_n]]
+                wf.write(json.dumps(_line) + '\n')
+    finally:
+        if wf is not sys.stdout:
+            wf.close()
+
+if __name__ == '__main__':
+    main()
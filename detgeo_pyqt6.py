@@ -1,26 +1,48 @@
-import os, sys, json
+import os, sys, json, hashlib, glob, time, copy
+# startup timing, see MainWindow.report_startup()
+t_start = time.perf_counter()
 import numpy as np
 import pyqtgraph as pg
 from PyQt6 import QtWidgets, QtCore, QtGui
-from contourpy import contour_generator
-from pyFAI import calibrant
-from gemmi import read_small_structure
+from detgeo_core import get_specs_geo, get_specs_plo, get_specs_lmt, load_par, \
+                        get_specs_det, get_det_library, calc_det_dims, calc_modules, \
+                        ContourEngine, ReferenceStore, calc_sweep, save_sweep, join_lines, \
+                        decimate_lines, merge_rings, trace_stage, trace_stages, FrameTrace
+# pyFAI and gemmi are slow to import, they are imported
+# when a reference or a cif file is needed
+t_import = time.perf_counter()
 
 ###########################################################
 # - stylesheet qframe (?)
-# - segmented contour lines are not
-#   displayed properly, only one segment is drawn (we pick
-#   the last). This happens when the grid is not large
-#   enough to host the full contour. To compensate, the
-#   grid gets a multiplier to reduce segmentation,
-#   multiplier = 1.5
 # - check causality
 # - find copy paste bugs from matplotlib version
 ###########################################################
 
 class MainWindow(pg.QtWidgets.QMainWindow):
-    def __init__(self, *args, **kwargs):
+    # send a contour job to the worker thread
+    sig_job = QtCore.pyqtSignal(int, object)
+    # send a coverage sweep to the sweep thread
+    sig_sweep = QtCore.pyqtSignal(object)
+    # artifacts and the parameters they depend on
+    # a change of a parameter only recalculates/redraws what depends on it
+    depends = {'exp_shape':   ('dist', 'rota', 'tilt', 'xoff', 'yoff', 'det', 'view', 'lod'),
+               'exp_label':   ('ener', 'unit', 'dist', 'rota', 'tilt', 'xoff', 'yoff', 'det'),
+               'beam_center': ('dist', 'rota', 'xoff', 'yoff', 'det'),
+               'ref_dsp':     ('reference',),
+               'ref_tth':     ('ener', 'reference', 'dist', 'det'),
+               'ref_shape':   ('dist', 'rota', 'tilt', 'xoff', 'yoff', 'det', 'view', 'lod'),
+               'heat_geo':    ('dist', 'rota', 'tilt', 'xoff', 'yoff', 'det', 'view', 'lod', 'heatmap'),
+               'heat_ener':   ('ener', 'heatmap')}
+    # names of the geometry parameters
+    par_names = {'ener':'Energy [keV]', 'dist':'Distance [mm]', 'rota':'Rotation [\u00B0]',
+                 'tilt':'Tilt [\u00B0]', 'xoff':'X offset [mm]', 'yoff':'Y offset [mm]'}
+
+    def __init__(self, *args, write_settings=True, **kwargs):
         super().__init__(*args, **kwargs)
+        # startup timing, see mark_startup()
+        self.startup = [('imports', (t_import - t_start) * 1e3)]
+        self.startup_last = t_import
+        self.mark_startup('application')
         # set path home
         self.path = os.path.dirname(__file__)
         # add an icon
@@ -46,13 +68,42 @@ class MainWindow(pg.QtWidgets.QMainWindow):
         # save parameters to file
         # - save_default: overwrite existing file with defaults
         # - force_write: overwrite existing file after load
-        self.init_par(file_dump, save_default=False, force_write=True)
+        # - write_settings: False leaves settings.json untouched, e.g. the
+        #   offscreen windows of detgeo_render.py run in parallel
+        self.init_par(file_dump, save_default=False, force_write=write_settings)
+        # tracing is switched on by the environment without touching
+        # settings.json, DETGEO_TRACE=1 or the name of the trace file
+        _trace = os.environ.get('DETGEO_TRACE', '')
+        if _trace not in ('', '0'):
+            self.plo.trace = True
+            if os.path.splitext(_trace)[1] in ('.csv', '.json'):
+                self.plo.trace_file = _trace
+        self.mark_startup('settings')
 
         # What standards should be available as reference
-        # The d spacings will be imported from pyFAI
-        self.geo.ref_library = calibrant.names()
+        # The d spacings will be imported from pyFAI, see ReferenceStore
         # dict to store custom reference data
         self.geo.ref_custom = {}
+        # d spacings of dropped cif files are cached here
+        # and restored at startup
+        self.path_cif_cache = os.path.join(self.path, 'cif_cache')
+        # sha1 of the cif file per custom reference, see get_custom_name()
+        self.ref_custom_hash = {}
+        self.load_cif_cache()
+        # d spacings of the library references are read from the
+        # calibrant index (calibrants.npy), pyFAI is the fallback
+        # compile it: python detgeo_core.py --calibrants calibrants.npy
+        self.ref_store = ReferenceStore(self.plo.cont_ref_cache, os.path.join(self.path, 'calibrants.npy'))
+        # plot item (and color) slot per drawn reference, see get_reference()
+        self.ref_slots = {}
+        # references of the settings that are neither cif files of the
+        # cache nor in the calibrant index are dropped, pyFAI is only
+        # asked when its menu is opened, see populate_pyFAI_menu()
+        _unknown = [_r for _r in self.geo.reference if _r not in self.geo.ref_custom and _r not in self.ref_store.names()]
+        if _unknown:
+            print(f'Warning: unknown reference {", ".join(_unknown)} is not drawn')
+            self.geo.reference = [_r for _r in self.geo.reference if _r not in _unknown]
+        self.mark_startup('references')
 
         # define grid layout
         self.layout = pg.QtWidgets.QGridLayout()
@@ -64,14 +115,20 @@ class MainWindow(pg.QtWidgets.QMainWindow):
         self.setCentralWidget(centralwidget)
         
         # get the detector specs
-        self.detectors = self.get_det_library()
+        self.detectors = get_det_library(self.path)
 
         # pick current detector
-        self.det = self.get_specs_det(self.detectors, self.geo.det_type, self.geo.det_size)
+        self.det = get_specs_det(self.detectors, self.geo.det_type, self.geo.det_size)
+        # contour calculations from GUI and worker thread
+        self.engine = ContourEngine(self.plo, self.det)
+        self.mark_startup('detector')
         
         # add the plot to the layout
         self.ax = pg.plot()
         self.layout.addWidget(self.ax)
+        # contours outside of the view are skipped
+        # redraw when the view changes (pan/zoom)
+        self.ax.getViewBox().sigRangeChanged.connect(self.change_view)
 
         # translate unit for plot title
         self.geo.unit_names = ['2\U0001D6F3 [\u00B0]', 'd [\u212B\u207B\u00B9]', 'q [\u212B]', 'sin(\U0001D6F3)/\U0001D706 [\u212B]']
@@ -79,11 +136,72 @@ class MainWindow(pg.QtWidgets.QMainWindow):
             print(f'Error: Valid geo.unit range is from 0 to {len(self.geo.unit_names)-1}, geo.unit={self.geo.unit}')
             raise SystemExit
         
+        # contour lines are calculated in a worker thread
+        # - jobs are numbered, only the latest is drawn
+        self.job_id = 0
+        self.worker = ContourWorker(self.engine.calc_job)
+        self.worker_thread = QtCore.QThread(self)
+        self.worker.moveToThread(self.worker_thread)
+        self.sig_job.connect(self.worker.run)
+        self.worker.finished.connect(self.apply_job)
+        self.worker_thread.start()
+        # coverage maps are calculated in their own thread, the
+        # contours keep being drawn meanwhile, see show_coverage()
+        self.sweep_busy = False
+        self.sweep_worker = SweepWorker()
+        self.sweep_thread = QtCore.QThread(self)
+        self.sweep_worker.moveToThread(self.sweep_thread)
+        self.sig_sweep.connect(self.sweep_worker.run)
+        self.sweep_worker.finished.connect(self.apply_sweep)
+        self.sweep_thread.start()
+        # slider changes are collected and rendered at plo.render_fps
+        self.scheduler = RenderScheduler(self, self.render_screen, self.plo.render_fps, self.plo.render_stats)
+        # level of detail
+        # - while dragging, the contour resolution is scaled (lod_scale)
+        #   to keep the frames within plo.render_budget
+        # - after plo.render_idle, the contours are refined
+        #   to plo.render_refine times the set resolution
+        self.lod_scale = 1.0
+        self.lod_drawn = 0.0
+        # the slider that is dragged, its neighbouring positions
+        # are calculated ahead, see get_prefetch()
+        self.drag_par = None
+        self.lod_timer = QtCore.QTimer(self)
+        self.lod_timer.setSingleShot(True)
+        self.lod_timer.setInterval(self.plo.render_idle)
+        self.lod_timer.timeout.connect(self.refine_screen)
+        # pan/zoom: the items are scaled along while the view moves,
+        # the contours are recalculated for the new view after
+        # plo.render_view, restricted to and sampled for the view
+        self.view_timer = QtCore.QTimer(self)
+        self.view_timer.setSingleShot(True)
+        self.view_timer.setInterval(self.plo.render_view)
+        self.view_timer.timeout.connect(self.render_view)
+        # outdated artifacts, see invalidate()
+        self.invalid = set(self.depends)
+        # artifacts of submitted jobs that are not yet drawn
+        self.unapplied = set()
+
+        # render stage timing per frame, see apply_job()
+        # the frame is complete when it is painted, see trace_paint()
+        self.trace = None
+        self.trace_frame = None
+        if self.plo.trace:
+            self.trace = FrameTrace(self.plo.trace_len, os.path.join(self.path, self.plo.trace_file) if self.plo.trace_file else None)
+            self.paint_timer = PaintTimer(self.ax.viewport(), self.trace_paint)
+            # opaque, the plot is not repainted for the overlay
+            self.trace_label = QtWidgets.QLabel(self.ax)
+            self.trace_label.setStyleSheet('background: white; color: gray; font-family: monospace; padding: 2px;')
+            self.trace_label.setVisible(self.plo.trace_overlay)
+
         # initialize the detector screen
+        self.mark_startup('plot')
         self.init_screen()
+        self.mark_startup('screen')
         
         # populate the menus with detectors, references and units
         self.init_menus()
+        self.mark_startup('menus')
         self.sliderWidget = SliderWidget(self, self.geo, self.plo, self.lmt)
         self.setStyleSheet('''
                 SliderWidget {
@@ -95,6 +213,20 @@ class MainWindow(pg.QtWidgets.QMainWindow):
                     background: #aad3d3d3;
                 }
             ''')
+        self.mark_startup('sliders')
+
+    def mark_startup(self, name):
+        # time since the last mark [ms]
+        _t = time.perf_counter()
+        self.startup.append((name, (_t - self.startup_last) * 1e3))
+        self.startup_last = _t
+
+    def report_startup(self):
+        # print where the launch time goes
+        self.mark_startup('show')
+        for _name, _ms in self.startup:
+            print(f'Startup: {_name:<12} {_ms:8.1f} ms')
+        print(f'Startup: {"total":<12} {(self.startup_last - t_start) * 1e3:8.1f} ms')
 
     def init_screen(self):
         # init the plot for contours and beam center
@@ -110,6 +242,7 @@ class MainWindow(pg.QtWidgets.QMainWindow):
         self.get_colormap()
 
         # container for contour lines
+        # one plot item per reference, see add_reference_item()
         self.plo.contours = {'exp':[], 'ref':[], 'labels':[]}
         # add empty plot per contour line
         font = QtGui.QFont()
@@ -122,49 +255,78 @@ class MainWindow(pg.QtWidgets.QMainWindow):
             self.plo.contours['labels'].append(temp_label)
             self.ax.addItem(temp_label)
         
-        # add empty plot per reference contour line
-        for _ in range(self.plo.cont_ref_num):
-            self.plo.contours['ref'].append(self.ax.plot(useCache=True, pxMode=True))
+        # add an empty plot for the reference contour lines
+        # further references add their own, see draw_reference()
+        self.add_reference_item()
 
         # add beam center scatter plot
         self.plo.beam_center = pg.ScatterPlotItem()
         self.ax.addItem(self.plo.beam_center)
 
+        # all detector modules are drawn by a single path item
+        # the rendered modules are cached until the view is scaled
+        self.plo.modules = QtWidgets.QGraphicsPathItem()
+        self.plo.modules.setPen(pg.mkPen(color = self.plo.module_color, width = 0))
+        self.plo.modules.setBrush(pg.mkBrush(color = self.plo.module_color))
+        self.plo.modules.setOpacity(self.plo.module_alpha)
+        self.plo.modules.setCacheMode(QtWidgets.QGraphicsItem.CacheMode.DeviceCoordinateCache)
+        self.ax.addItem(self.plo.modules)
+
+        # heatmap behind everything, see draw_heatmap()
+        # NaN (off module) pixels are transparent
+        self.plo.heat_img = pg.ImageItem(axisOrder='row-major')
+        self.plo.heat_img.setColorMap(pg.colormap.get(self.plo.heat_cmap_name))
+        self.plo.heat_img.setOpacity(self.plo.heat_alpha)
+        self.plo.heat_img.setZValue(-1)
+        self.plo.heat_img.setVisible(False)
+        self.ax.addItem(self.plo.heat_img)
+        # energy free heatmap of the current geometry
+        self.plo.heat_data = None
+
+        # 2-theta, reference index and lines of the drawn reference contours
+        self.plo.cont_ref_ttr = np.zeros(0)
+        self.plo.cont_ref_item = np.zeros(0, dtype=int)
+        self.plo.cont_ref_lines = []
+
+        # generate contour levels
+        self.plo.cont_levels = np.linspace(self.plo.cont_tth_min, self.plo.cont_tth_max, self.plo.cont_tth_num)
+
+        # add unit label
+        self.add_unit_label()
+
+        # fit the plot to the detector, create cones and draw contour lines
+        self.update_detector()
+
+    def update_detector(self):
+        # fit the existing plot items to the current detector
         # figure out proper plot dimensions
-        self.plo.xdim = (self.det.hms * self.det.hmn + self.det.pxs * self.det.hgp * self.det.hmn + self.det.cbh)/2
-        self.plo.ydim = (self.det.vms * self.det.vmn + self.det.pxs * self.det.vgp * self.det.vmn + self.det.cbh)/2
+        self.plo.xdim, self.plo.ydim = calc_det_dims(self.det)
         
         # limit the axis x and y
-        self.ax.setXRange(-self.plo.xdim, self.plo.xdim, padding=0)
-        self.ax.setYRange(-self.plo.ydim, self.plo.ydim, padding=0)
         # self.ax.setLimits(minXRange=self.plo.xdim*2,
         #                   minYRange=self.plo.ydim*2)
         self.ax.setLimits(xMin=-self.plo.xdim*1.05,
                           xMax= self.plo.xdim*1.05,
                           yMin=-self.plo.ydim*1.05,
                           yMax= self.plo.ydim*1.05)
-
+        self.ax.setXRange(-self.plo.xdim, self.plo.xdim, padding=0)
+        self.ax.setYRange(-self.plo.ydim, self.plo.ydim, padding=0)
         
         # resize the window
         self.resize(int(self.plo.plot_size*self.plo.xdim/self.plo.ydim), self.plo.plot_size + self.offset_win32)
 
-        # scale contour grid to detector size
-        multiplier = 1.5
-        self.plo.cont_grid_max = int(np.ceil(max(self.plo.xdim*multiplier, self.plo.ydim*multiplier)))
-        
-        # generate contour levels
-        self.plo.cont_levels = np.linspace(self.plo.cont_tth_min, self.plo.cont_tth_max, self.plo.cont_tth_num)
+        # the engine caches belong to the detector
+        self.engine.set_detector(self.det)
 
         # build detector modules
         self.build_detector()
 
-        # add unit label
-        self.add_unit_label()
+        # move unit label
+        self.unit_label.setPos(-self.plo.xdim, self.plo.ydim)
 
         # create cones and draw contour lines
-        self.draw_contours()
-        self.get_reference()
-        self.draw_reference()
+        self.invalidate('det')
+        self.render_screen(sync=True)
 
     def init_menus(self):
         menuBar = QtWidgets.QMenuBar()
@@ -189,34 +351,32 @@ class MainWindow(pg.QtWidgets.QMainWindow):
                 if d == self.geo.det_type.upper() and s == self.geo.det_size.upper():
                     det_action.setChecked(True)
         
+        # several references are drawn at once, a click toggles
+        # a reference, see check_references()
         self.menu_ref = menuBar.addMenu('Reference')
         self.group_ref = QtGui.QActionGroup(self)
-        self.group_ref.setExclusive(True)
+        self.group_ref.setExclusive(False)
         
         # menu Reference: add None
-        ref_action = QtGui.QAction('None', self, checkable=True)
-        self.set_menu_action(ref_action, self.change_reference, 'None')
-        self.menu_ref.addAction(ref_action)
-        self.group_ref.addAction(ref_action)
-        if 'None' == self.geo.reference:
-            ref_action.setChecked(True)
+        self.ref_none_action = QtGui.QAction('None', self, checkable=True)
+        self.set_menu_action(self.ref_none_action, self.change_reference, 'None')
+        self.menu_ref.addAction(self.ref_none_action)
+        self.ref_none_action.setChecked(not self.geo.reference)
         
         # menu Reference: add pyFAI library
+        # the calibrants are added when the menu is opened
         self.sub_menu_pyFAI = QtWidgets.QMenu('pyFAI', self)
         self.sub_menu_pyFAI.setStatusTip('')
+        self.sub_menu_pyFAI.aboutToShow.connect(self.populate_pyFAI_menu)
         self.menu_ref.addMenu(self.sub_menu_pyFAI)
-        for ref_name in self.geo.ref_library:
-            ref_action = QtGui.QAction(ref_name, self, checkable=True)
-            self.set_menu_action(ref_action, self.change_reference, ref_name)
-            self.sub_menu_pyFAI.addAction(ref_action)
-            self.group_ref.addAction(ref_action)
-            if ref_name == self.geo.reference:
-                ref_action.setChecked(True)
 
         # menu Reference: add Custom
         self.sub_menu_custom = QtWidgets.QMenu('Custom', self)
         self.sub_menu_custom.setStatusTip('Drag and Drop *.cif files.')
         self.menu_ref.addMenu(self.sub_menu_custom)
+        self.custom_actions = {}
+        for ref_name in self.geo.ref_custom:
+            self.add_custom_reference(ref_name)
         
         # menu Units
         menu_unit = menuBar.addMenu('Units')
@@ -230,6 +390,47 @@ class MainWindow(pg.QtWidgets.QMainWindow):
             if unit_index == self.geo.unit:
                 unit_action.setChecked(True)
 
+        # menu Heatmap
+        menu_heat = menuBar.addMenu('Heatmap')
+        group_heat = QtGui.QActionGroup(self)
+        group_heat.setExclusive(True)
+        for heat_name, heat_label in (('None', 'None'), ('d', 'd [\u212B]'), ('q', 'q [\u212B\u207B\u00B9]'), ('omega', 'Solid angle [sr]')):
+            heat_action = QtGui.QAction(heat_label, self, checkable=True)
+            self.set_menu_action(heat_action, self.change_heatmap, heat_name)
+            menu_heat.addAction(heat_action)
+            group_heat.addAction(heat_action)
+            if heat_name == self.plo.heat_map:
+                heat_action.setChecked(True)
+
+        # menu Coverage
+        # resolution coverage map over two parameters
+        # the other parameters are taken from the current geometry
+        menu_cov = menuBar.addMenu('Coverage')
+        for axes in (('ener', 'dist'), ('ener', 'yoff'), ('dist', 'yoff'), ('dist', 'rota'), ('yoff', 'rota')):
+            cov_action = QtGui.QAction(' / '.join(self.par_names[_p] for _p in axes), self)
+            self.set_menu_action(cov_action, self.show_coverage, axes)
+            menu_cov.addAction(cov_action)
+
+    def populate_pyFAI_menu(self):
+        # menu Reference: add pyFAI library
+        # once, the first time the menu is shown
+        if not self.sub_menu_pyFAI.isEmpty():
+            return
+        # pyFAI is needed now, newer calibrants are added to the index
+        for ref_name in self.ref_store.names(full=True):
+            ref_action = QtGui.QAction(ref_name, self, checkable=True)
+            self.set_menu_action(ref_action, self.change_reference, ref_name)
+            self.sub_menu_pyFAI.addAction(ref_action)
+            self.group_ref.addAction(ref_action)
+            if ref_name in self.geo.reference:
+                ref_action.setChecked(True)
+
+    def check_references(self):
+        # check the drawn references in the menu
+        for ref_action in self.group_ref.actions():
+            ref_action.setChecked(ref_action.text() in self.geo.reference)
+        self.ref_none_action.setChecked(not self.geo.reference)
+
     def add_unit_label(self):
         font = QtGui.QFont()
         font.setPixelSize(self.plo.unit_label_size)
@@ -237,48 +438,168 @@ class MainWindow(pg.QtWidgets.QMainWindow):
         self.unit_label.setText(self.geo.unit_names[self.geo.unit])
         self.unit_label.setFont(font)
         self.ax.addItem(self.unit_label)
-        self.unit_label.setPos(-self.plo.xdim, self.plo.ydim)
 
     def set_menu_action(self, action, target, *args):
         action.triggered.connect(lambda: target(*args))
 
     def change_detector(self, det_name, det_size):
-        self.det = self.get_specs_det(self.detectors, det_name, det_size)
-        self.ax.clear()
-        self.init_screen()
+        self.det = get_specs_det(self.detectors, det_name, det_size)
+        # pending results belong to the old detector
+        self.cancel_jobs()
+        # the plot items are kept
+        self.update_detector()
         self.sliderWidget.center_frame()
 
+    def change_view(self):
+        # pan/zoom, every range change restarts the timer
+        self.invalidate('view')
+        self.view_timer.start()
+
+    def render_view(self):
+        # the view settled, draw it at the refined resolution
+        # nothing to do if e.g. update_detector() drew it already
+        if not self.invalid:
+            return
+        self.lod_timer.stop()
+        self.render_screen(scale=self.plo.render_refine)
+
     def change_units(self, unit_index):
         self.geo.unit = unit_index
         self.unit_label.setText(self.geo.unit_names[unit_index])
-        self.draw_contours()
+        # only the labels change
+        self.invalidate('unit')
+        self.render_screen(sync=True)
+
+    def change_heatmap(self, heat_name):
+        self.plo.heat_map = heat_name
+        self.invalidate('heatmap')
+        self.render_screen(sync=True)
+
+    def show_coverage(self, axes):
+        # resolution coverage on a grid over the limits of axes
+        # calculated by a pool of worker processes, see calc_sweep()
+        # the sweep runs in the sweep thread, one at a time
+        if self.sweep_busy:
+            return
+        self.sweep_busy = True
+        QtWidgets.QApplication.setOverrideCursor(QtCore.Qt.CursorShape.BusyCursor)
+        # the sliders keep changing self.geo
+        self.sig_sweep.emit((copy.copy(self.geo), self.lmt, self.det, axes, self.plo.sweep_num, self.plo.sweep_workers))
+
+    def apply_sweep(self, res, error):
+        # show the coverage map or why the sweep failed
+        self.sweep_busy = False
+        QtWidgets.QApplication.restoreOverrideCursor()
+        if res is None:
+            QtWidgets.QMessageBox.warning(self, 'Coverage', f'The coverage map could not be calculated.\n{error}')
+            return
+        self.coverage = CoverageWindow(self, res)
+        self.coverage.show()
+
+    def set_geometry(self, pars):
+        # set the geometry parameters pars (dict), e.g. picked from
+        # the coverage map, and move the sliders along
+        _sliders = {_s.objectName():_s for _s in self.sliderWidget.findChildren(QtWidgets.QSlider)}
+        for _p, _v in pars.items():
+            if _p in _sliders:
+                _sliders[_p].setValue(int(round(_v)))
+            setattr(self.geo, _p, float(_v))
+            self.invalidate(_p)
+        self.render_screen(sync=True)
 
     def change_reference(self, ref_name):
-        self.geo.reference = ref_name
-        self.get_reference()
-        self.draw_reference()
+        # toggle the reference ref_name, 'None' removes all
+        if ref_name == 'None':
+            self.set_references([])
+        elif ref_name in self.geo.reference:
+            self.set_references([_r for _r in self.geo.reference if _r != ref_name])
+        else:
+            self.set_references(self.geo.reference + [ref_name])
+
+    def set_references(self, ref_names):
+        # draw the references ref_names (list), each one in its own color
+        self.geo.reference = list(ref_names)
+        self.check_references()
+        self.invalidate('reference')
+        self.render_screen(sync=True)
 
     def get_cif_reference(self, fpath):
         # Drag-and-Drop cif-file
         #  get_cif_reference()
         #  - use gemmi to get cell, centring and crystal  system from cif
         #  - use pyFAI get_d_spacings() to create contours
+        #  - the reflections are cached (cif_cache/<sha1>.npz), a known
+        #    cif file is not parsed again
+        with open(fpath, 'rb') as rf:
+            _hash = hashlib.sha1(rf.read()).hexdigest()
+        _cache = os.path.join(self.path_cif_cache, f'{_hash}.npz')
+        if os.path.exists(_cache):
+            # a known cif file keeps its name, whatever the file is called now
+            with np.load(_cache) as _ref:
+                ref_name = self.get_custom_name(str(_ref['name']), _hash)
+                _dsp = _ref['dsp']
+        else:
+            ref_name = self.get_custom_name(os.path.basename(fpath), _hash)
+            _dsp = self.calc_cif_reflections(fpath, ref_name, _cache)
+        if ref_name not in self.geo.ref_custom:
+            self.add_custom_reference(ref_name)
+        self.geo.ref_custom[ref_name] = _dsp
+        # the d spacings might have changed, redraw in any case
+        self.set_references([_r for _r in self.geo.reference if _r != ref_name] + [ref_name])
+
+    def calc_cif_reflections(self, fpath, ref_name, save_as):
+        # calculate the reflections of a cif file
+        # d spacings (descending), hkl and multiplicity are saved to save_as
+        from gemmi import read_small_structure
+        from pyFAI import calibrant
         ref = read_small_structure(fpath)
         cell = ref.cell.parameters
         lattice_type = ref.find_spacegroup().centring_type()
         lattice = ref.find_spacegroup().crystal_system_str()
-        
-        self.plo.cont_ref_dsp = list(map(float, calibrant.Cell(*cell, lattice=lattice, lattice_type=lattice_type).d_spacing(dmin=0.4).keys()))[::-1][:self.plo.cont_ref_num]
-        self.geo.reference = os.path.basename(fpath)
-        self.geo.ref_custom[self.geo.reference] = self.plo.cont_ref_dsp
+        reflections = calibrant.Cell(*cell, lattice=lattice, lattice_type=lattice_type).d_spacing(dmin=0.4)
+        _dsp = np.array(list(map(float, reflections.keys())))
+        # the list of equivalent reflections might be preceded
+        # by the numerical d value, keep the Miller indices
+        _hkl = [[_r for _r in _v if np.ndim(_r) == 1 and len(_r) == 3] for _v in reflections.values()]
+        _order = np.argsort(_dsp)[::-1]
+        os.makedirs(self.path_cif_cache, exist_ok=True)
+        np.savez(save_as,
+                 name = ref_name,
+                 dsp = _dsp[_order],
+                 hkl = np.array([_hkl[_i][0] for _i in _order], dtype=np.int16).reshape(-1,3),
+                 mult = np.array([len(_hkl[_i]) for _i in _order], dtype=np.int32))
+        return _dsp[_order]
 
-        ref_action = QtGui.QAction(self.geo.reference, self, checkable=True)
-        self.set_menu_action(ref_action, self.change_reference, self.geo.reference)
+    def load_cif_cache(self):
+        # restore the custom references from the cif cache
+        # without touching gemmi or pyFAI
+        for _cache in sorted(glob.glob(os.path.join(self.path_cif_cache, '*.npz')), key=os.path.getmtime):
+            _hash = os.path.splitext(os.path.basename(_cache))[0]
+            with np.load(_cache) as _ref:
+                self.geo.ref_custom[self.get_custom_name(str(_ref['name']), _hash)] = _ref['dsp']
+
+    def get_custom_name(self, ref_name, cif_hash):
+        # name of a custom reference, one per cif file (sha1)
+        # - a known cif file keeps its name
+        # - the file name, unless a different cif file has it already,
+        #   then a short hash is added
+        for _name, _hash in self.ref_custom_hash.items():
+            if _hash == cif_hash:
+                return _name
+        if self.ref_custom_hash.get(ref_name, cif_hash) != cif_hash:
+            ref_name = f'{ref_name} [{cif_hash[:7]}]'
+        self.ref_custom_hash[ref_name] = cif_hash
+        return ref_name
+
+    def add_custom_reference(self, ref_name):
+        # add a custom reference to the menu
+        ref_action = QtGui.QAction(ref_name, self, checkable=True)
+        self.set_menu_action(ref_action, self.change_reference, ref_name)
         self.sub_menu_custom.addAction(ref_action)
         self.group_ref.addAction(ref_action)
-        ref_action.setChecked(True)
-
-        self.draw_reference()
+        self.custom_actions[ref_name] = ref_action
+        if ref_name in self.geo.reference:
+            ref_action.setChecked(True)
 
     def get_colormap(self):
         # figure out the color of the buttons and slider handles
@@ -292,354 +613,317 @@ class MainWindow(pg.QtWidgets.QMainWindow):
             self.plo.plot_handle_color = self.plo.plot_color
     
     def get_reference(self):
-        if self.geo.reference in self.geo.ref_library:
-            # get the d spacings for the calibrtant from pyFAI
-            self.plo.cont_ref_dsp = np.array(calibrant.get_calibrant(self.geo.reference).get_dSpacing()[:self.plo.cont_ref_num])
-        elif self.geo.reference in self.geo.ref_custom:
-            # get custom d spacings
-            self.plo.cont_ref_dsp = self.geo.ref_custom[self.geo.reference]
-        else:
-            # set all d-spacings to -1
-            self.plo.cont_ref_dsp = np.zeros(self.plo.cont_ref_num) -1
-
-    def get_specs_geo(self):
-        ######################
-        # Setup the geometry #
-        ######################
-        geo = container()
-        geo.det_type = 'EIGER2' # [str]  Pilatus3 / Eiger2
-        geo.det_size = '4M'     # [str]  300K 1M 2M 6M / 1M 4M 9M 16M
-        geo.ener = 21.0         # [keV]  Beam energy
-        geo.dist = 75.0         # [mm]   Detector distance
-        geo.yoff = 0.0          # [mm]   Detector offset (vertical)
-        geo.xoff = 0.0          # [mm]   Detector offset (horizontal)
-        geo.rota = 25.0         # [deg]  Detector rotation
-        geo.tilt = 0.0          # [deg]  Detector tilt
-        geo.unit = 1            # [0-3]  Contour legend
-                                #          0: 2-Theta
-                                #          1: d-spacing
-                                #          2: q-space
-                                #          3: sin(theta)/lambda
-        geo.reference = 'None'  # [str]  Plot reference contours
-                                #          pick from pyFAI
-        return geo
-
-    def get_specs_plo(self):
-        ################
-        # Plot Details #
-        ################
-        plo = container()
-        # - geometry contour section - 
-        plo.cont_tth_min = 5                # [int]    Minimum 2-theta contour line
-        plo.cont_tth_max = 120              # [int]    Maximum 2-theta contour line
-        plo.cont_tth_num = 24               # [int]    Number of contour lines
-        plo.cont_geom_cmark = 'o'           # [marker] Beam center marker (geometry)
-        plo.cont_geom_csize = 6             # [int]    Beam center size (geometry)
-        plo.cont_geom_lw = 4.0              # [float]  Contour linewidth
-        plo.cont_geom_label_size = 14       # [int]    Contour label size
-        plo.cont_geom_cmap_name = 'viridis' # [cmap]   Contour colormap (geometry)
-        # - reference contour section - 
-        plo.cont_ref_alpha = 0.25           # [float]  Reference contour alpha
-        plo.cont_ref_color = 'gray'         # [color]  Reference contour color
-        plo.cont_ref_lw = 5.0               # [float]  Reference contour linewidth
-        plo.cont_ref_num = 48               # [int]    Number of reference contours
-        # - module section - 
-        plo.module_alpha = 0.20             # [float]  Detector module alpha
-        plo.module_color = 'gray'           # [color]  Detector module color
-        # - general section - 
-        plo.cont_reso_min = 48              # [int]    Minimum contour steps
-        plo.cont_reso_max = 256             # [int]    Maximum contour steps
-        plo.plot_size = 768                 # [int]    Plot size, px
-        plo.unit_label_size = 16            # [int]    Label size, px
-        plo.unit_label_color = 'gray'       # [str]    Label color
-        plo.unit_label_fill = 'white'       # [str]    Label fill color
-        plo.plot_color = 0.35               # [float]  Button color from colormap (0.0 - 1.0)
-                                            # [str]    Button color e.g. '#1f77b4'
-        # -slider section - 
-        plo.action_ener = True              # [bool]   Show energy slider
-        plo.action_dist = True              # [bool]   Show distance slider
-        plo.action_rota = True              # [bool]   Show rotation slider
-        plo.action_yoff = True              # [bool]   Show vertical offset slider
-        plo.action_xoff = True              # [bool]   Show horizontal offset slider
-        plo.action_tilt = True              # [bool]   Show tilt slider
-
-        return plo
-
-    def get_specs_lmt(self):
-        ##########
-        # Limits #
-        ##########
-        lmt = container()
-        lmt.ener_min = 1.0   # [float] Energy minimum [keV]
-        lmt.ener_max = 100.0 # [float] Energy maximum [keV]
-        lmt.ener_stp = 1.0   # [float] Energy step size [keV]
-        lmt.dist_min = 40.0  # [float] Distance minimum [mm]
-        lmt.dist_max = 150.0 # [float] Distance maximum [mm]
-        lmt.dist_stp = 1.0   # [float] Distance step size [mm]
-        lmt.xoff_min = -50.0 # [float] Horizontal offset minimum [mm]
-        lmt.xoff_max = 50.0  # [float] Horizontal offset maximum [mm]
-        lmt.xoff_stp = 1.0   # [float] Horizontal offset step size [mm]
-        lmt.yoff_min = 0.0   # [float] Vertical offset minimum [mm]
-        lmt.yoff_max = 200.0 # [float] Vertical offset maximum [mm]
-        lmt.yoff_stp = 1.0   # [float] Vertical offset step size [mm]
-        lmt.rota_min = 0.0   # [float] Rotation minimum [deg]
-        lmt.rota_max = 75.0  # [float] Rotation maximum [deg]
-        lmt.rota_stp = 1.0   # [float] Rotation step size [deg]
-        lmt.tilt_min = 0.0   # [float] Tilt minimum [deg]
-        lmt.tilt_max = 45.0  # [float] Tilt maximum [deg]
-        lmt.tilt_stp = 1.0   # [float] Tilt step size [deg]
-        
-        return lmt
-
-    def get_specs_det(self, detectors, det_type, det_size):
-        det_type = det_type.upper()
-        det_size = det_size.upper()
-
-        if det_type not in detectors.keys():
-            print('Unknown detector type!')
-            raise SystemExit
-        
-        if det_size not in detectors[det_type]['size'].keys():
-            print('Unknown detector type/size combination!')
-            raise SystemExit
-        
-        det = container()
-        det.hms = detectors[det_type]['hms']
-        det.vms = detectors[det_type]['vms']
-        det.pxs = detectors[det_type]['pxs']
-        det.hgp = detectors[det_type]['hgp']
-        det.vgp = detectors[det_type]['vgp']
-        det.cbh = detectors[det_type]['cbh']
-        det.hmn, det.vmn = detectors[det_type]['size'][det_size]
-        det.name = f'{det_type} {det_size}'
-
-        return det
-
-    def get_det_library(self):
-        ###########################
-        # Detector Specifications #
-        ###########################
-        detectors = dict()
-            ###############################
-            # Specifications for Pilatus3 #
-            ###############################
-        detectors['PILATUS3'] = {
-            'hms' : 83.8,    # [mm]  Module size (horizontal)
-            'vms' : 33.5,    # [mm]  Module size (vertical)
-            'pxs' : 172e-3,  # [mm]  Pixel size
-            'hgp' : 7,       # [pix] Gap between modules (horizontal)
-            'vgp' : 17,      # [pix] Gap between modules (vertical)
-            'cbh' : 0,       # [mm]  Central beam hole
-            'size' : {'300K':(1,3),'1M':(2,5),'2M':(3,8),'6M':(5,12)},
-            }
-            ###############################
-            # Specifications for Pilatus4 #
-            ###############################
-        detectors['PILATUS4'] = {
-            'hms' : 75.0,    # [mm]  Module size (horizontal)
-            'vms' : 39.0,    # [mm]  Module size (vertical)
-            'pxs' : 150e-3,  # [mm]  Pixel size
-            'hgp' : 8,       # [pix] Gap between modules (horizontal)
-            'vgp' : 12,      # [pix] Gap between modules (vertical)
-            'cbh' : 0,       # [mm]  Central beam hole
-            'size' : {'260K':(1,2),'800K':(2,3),'1M':(2,4),'1.5M':(3,4),'2M':(3,6),'3M':(4,6)}
-            }
-        
-            #############################
-            # Specifications for Eiger2 #
-            #############################
-        detectors['EIGER2'] = {
-            'hms' : 77.1,    # [mm]  Module size (horizontal)
-            'vms' : 38.4,    # [mm]  Module size (vertical)
-            'pxs' : 75e-3,   # [mm]  Pixel size
-            'hgp' : 38,      # [pix] Gap between modules (horizontal)
-            'vgp' : 12,      # [pix] Gap between modules (vertical)
-            'cbh' : 0,       # [mm]  Central beam hole
-            'size' : {'1M':(1,2),'4M':(2,4),'9M':(3,6),'16M':(4,8)},
-            }
-        
-            #############################
-            # Specifications for MPCCD #
-            #############################
-        detectors['MPCCD'] = {
-            'hms' : 51.2,    # [mm]  Module size (horizontal)
-            'vms' : 25.6,    # [mm]  Module size (vertical)
-            'pxs' : 50e-3,   # [mm]  Pixel size
-            'hgp' : 18,      # [pix] Gap between modules (horizontal)
-            'vgp' : 27,      # [pix] Gap between modules (vertical)
-            'cbh' : 3,       # [mm]  Central beam hole
-            'size' : {'4M':(2,4)},
-            }
-        
-        # make file dump
-        file_dump = os.path.join(self.path, 'detectors.json')
-        if not os.path.exists(file_dump):
-            with open(file_dump, 'w') as wf:
-                json.dump(detectors, wf, indent=4)
-        else:
-            with open(file_dump, 'r') as of:
-                detectors = json.load(of)
-        
-        return detectors
+        # d spacings of all references in one array, up to
+        # plo.cont_ref_num per reference, and the slot of each,
+        # see get_ref_ttr()
+        # a reference keeps its slot (plot item and color) while it
+        # is drawn, new ones take the lowest free slot
+        self.ref_slots = {_r:_s for _r, _s in self.ref_slots.items() if _r in self.geo.reference}
+        for ref_name in self.geo.reference:
+            if ref_name not in self.ref_slots:
+                self.ref_slots[ref_name] = min(set(range(len(self.ref_slots) + 1)) - set(self.ref_slots.values()))
+        # no reference, pyFAI is not needed
+        _dsp, _item = [np.zeros(0)], [np.zeros(0, dtype=int)]
+        for ref_name in self.geo.reference:
+            if ref_name in self.geo.ref_custom:
+                # get custom d spacings
+                _ref = self.geo.ref_custom[ref_name][:self.plo.cont_ref_num]
+            elif ref_name in self.ref_store.names():
+                # get the d spacings for the calibrtant from pyFAI
+                _ref = self.ref_store.get(ref_name)[:self.plo.cont_ref_num]
+            else:
+                # unknown, nothing to draw
+                continue
+            _dsp.append(np.asarray(_ref, dtype=float))
+            _item.append(np.full(len(_ref), self.ref_slots[ref_name]))
+        self.plo.cont_ref_dsp = np.concatenate(_dsp)
+        self.plo.cont_ref_dsp_item = np.concatenate(_item)
 
     def build_detector(self):
         # build detector modules
-        # beam position is between the modules (even) or at the center module (odd)
-        # determined by the "+det.hmn%2" part
-        for i in range(-self.det.hmn//2+self.det.hmn%2, self.det.hmn-self.det.hmn//2):
-            for j in range(-self.det.vmn//2+self.det.vmn%2, self.det.vmn-self.det.vmn//2):
-                # - place modules along x (i) and y (j) keeping the gaps in mind ( + (det.hgp*det.pxs)/2)
-                # - the " - ((det.hms+det.hgp*det.pxs)/2)" positions the origin (the beam) at the center of a module
-                #   and "det.hmn%2" makes sure this is only active for detectors with an odd number of modules
-                # - define sets of panels that collectively move to realize a central hole offset for MPCCD detectors
-                #   that are used at SACLA/SPring-8:
-                #   x = (...) + (det.cbh/2)*(2*(j&det.vmn)//det.vmn-1)
-                #   y = (...) + (det.cbh/2)*(1-2*(i&det.hmn)//det.hmn)
-                # - negative values of det.cbh for 'clockwise' offset order
-                origin_x = i * (self.det.hms + self.det.hgp * self.det.pxs) \
-                             - ((self.det.hms + self.det.hgp * self.det.pxs)/2) * (self.det.hmn % 2) \
-                             + (self.det.hgp * self.det.pxs)/2 \
-                             + (self.det.cbh/2) * (2*(j & self.det.vmn) // self.det.vmn-1)
-                origin_y = j * (self.det.vms + self.det.vgp * self.det.pxs) \
-                             - ((self.det.vms + self.det.vgp * self.det.pxs)/2) * (self.det.vmn%2) \
-                             + (self.det.vgp * self.det.pxs)/2 \
-                             + (self.det.cbh/2) * (1-2*(i & self.det.hmn) // self.det.hmn)
-                # add the module
-                rect_item = pg.QtWidgets.QGraphicsRectItem(origin_x, origin_y,  self.det.hms, self.det.vms)
-                rect_item.setPen(pg.mkPen(color = self.plo.module_color, width = 0))
-                rect_item.setBrush(pg.mkBrush(color = self.plo.module_color))
-                rect_item.setOpacity(self.plo.module_alpha)
-                self.ax.addItem(rect_item)
-
-    def draw_contours(self):
+        # module positions: see calc_modules()
+        # one closed outline (5 corners) per module, all modules
+        # make up a single path
+        _x0, _y0, _w, _h = calc_modules(self.det).T
+        X = np.column_stack([_x0, _x0 + _w, _x0 + _w, _x0, _x0]).ravel()
+        Y = np.column_stack([_y0, _y0, _y0 + _h, _y0 + _h, _y0]).ravel()
+        # connect the corners, not the modules
+        _connect = np.ones((len(_x0), 5), dtype=np.int32)
+        _connect[:,-1] = 0
+        self.plo.modules.setPath(pg.arrayToQPath(X, Y, connect=_connect.ravel()))
+
+    def draw_beam_center(self, geo):
         # calculate the offset of the contours resulting from yoff and rotation
-        # shift the grid to draw the cones, to make sure the contours are drawn
-        # within the visible area
-        _comp_shift = -(self.geo.yoff + np.tan(np.deg2rad(self.geo.rota))*self.geo.dist)
-        # increase the the cone grid to allow more
-        # contours to be drawn as the plane is tilted
-        _comp_add = np.tan(np.deg2rad(self.geo.tilt))*self.geo.dist
+        _comp_shift = -(geo.yoff + np.tan(np.deg2rad(geo.rota))*geo.dist)
         # update beam center
-        self.plo.beam_center.setData([self.geo.xoff],[_comp_shift],
+        self.plo.beam_center.setData([geo.xoff],[_comp_shift],
                                      symbol = self.plo.cont_geom_cmark,
                                      size = self.plo.cont_geom_csize,
                                      brush = pg.mkBrush(self.plo.cont_cmap.map(0, mode='qcolor')))
+
+    def draw_contours(self, job):
+        # draw the contour lines of job and position the labels
         for _n, _ttd in enumerate(self.plo.cont_levels):
             # current fraction for colormap
             _f = _n/len(self.plo.cont_levels)
-            # convert theta in degrees to radians
-            _ttr = np.deg2rad(_ttd)
-            # calculate ratio of sample to detector distance (sdd)
-            # and contour distance to beam center (cbc)
-            # _rat = sdd/cbc = 1/tan(2-theta)
-            # this is used to scale the cones Z dimension
-            _rat = 1/np.tan(_ttr)
-            # apply the min/max grid resolution
-            _grd_res = max(min(int(self.plo.cont_reso_min*_rat), self.plo.cont_reso_max), self.plo.cont_reso_min)
-            # prepare the grid for the cones/contours
-            # adjust the resolution using i (-> plo.cont_levels),
-            # as smaller cones/contours (large i) need higher sampling
-            # but make sure the sampling rate doesn't fall below the
-            # user set plo.cont_reso_min value and plo.cont_reso_max
-            # prevents large numbers that will take seconds to draw
-            # the grid position needs to adjusted upon change of geometry (y, vertical)
-            # the center needs to be shifted by _geo_offset to make sure all contour lines are drawn
-            _x1 = np.linspace(-self.plo.cont_grid_max + _comp_shift, self.plo.cont_grid_max - _comp_shift + _comp_add, _grd_res)
-            # the grid position needs to adjusted upon change of geometry (x, horizontal)
-            # the center needs to be shifted by geo.xoff to make sure all contour lines are drawn
-            _x2 = np.linspace(-self.plo.cont_grid_max - self.geo.xoff, self.plo.cont_grid_max - self.geo.xoff, _grd_res)
-            # Conversion factor keV to Angstrom: 12.398
-            # sin(t)/l: np.sin(Theta) / lambda -> (12.398/geo_energy)
-            _stl = np.sin(_ttr/2)/(12.398/self.geo.ener)
-            # d-spacing: l = 2 d sin(t) -> 1/2(sin(t)/l)
-            _dsp = 1/(2*_stl)
-            # prepare the values in the different units / labels
-            _units = {0:np.rad2deg(_ttr), 1:_dsp, 2:_stl*4*np.pi, 3:_stl}
-            # draw additional contours for normal incidence geometry
-            X0, Y0 = np.meshgrid(_x1,_x2)
-            Z0 = np.sqrt(X0**2+Y0**2)*_rat
-            X,Y,Z = self.calc_cone(X0, Y0, Z0, self.geo.rota, self.geo.tilt, self.geo.xoff, self.geo.yoff, self.geo.dist)
             # don't draw contour lines that are out of bounds
-            # make sure Z is large enough to draw the contour
-            if np.max(Z) >= self.geo.dist:
-                clines = contour_generator(x=X, y=Y, z=Z).lines(self.geo.dist)[-1]
-                self.plo.contours['exp'][_n].setData(clines, pen=pg.mkPen(self.plo.cont_cmap.map(_f, mode='qcolor'), width=self.plo.cont_geom_lw))
+            clines = job.exp[_n]
+            if clines is not None:
+                # vertex buffer and connect mask, see get_buffer()
+                X, Y, _con = self.get_buffer([clines], job.stages)
+                with trace_stage(job.stages, 'setData'):
+                    self.plo.contours['exp'][_n].setData(X, Y, connect=_con, pen=pg.mkPen(self.plo.cont_cmap.map(_f, mode='qcolor'), width=self.plo.cont_geom_lw))
                 self.plo.contours['exp'][_n].setVisible(True)
-                # label contour lines
-                self.plo.contours['labels'][_n].setText(f'{_units[self.geo.unit]:.2f}', color=self.plo.cont_cmap.map(_f, mode='qcolor'))
                 # find y position for label
                 # beyond 90 degree 2-theta the contour is bend 'the other way'
                 # and we need the minimum contour value to position the label
-                label_posy = np.max(clines[:,1]) if _ttd <= 90 else np.min(clines[:,1])
-                self.plo.contours['labels'][_n].setPos(self.geo.xoff, label_posy)
+                # contour lines may be interrupted (NaN) at the plot limits
+                label_posy = np.nanmax(clines[:,1]) if _ttd <= 90 else np.nanmin(clines[:,1])
+                self.plo.contours['labels'][_n].setPos(job.geo.xoff, label_posy)
                 self.plo.contours['labels'][_n].setVisible(True)
             else:
                 self.plo.contours['labels'][_n].setVisible(False)
                 self.plo.contours['exp'][_n].setVisible(False)
-    
-    def draw_reference(self):
+
+    def draw_labels(self, geo):
+        # label contour lines
+        # the labels depend on energy and unit, not on the contour shape
+        for _n, _ttd in enumerate(self.plo.cont_levels):
+            # current fraction for colormap
+            _f = _n/len(self.plo.cont_levels)
+            # convert theta in degrees to radians
+            _ttr = np.deg2rad(_ttd)
+            # Conversion factor keV to Angstrom: 12.398
+            # sin(t)/l: np.sin(Theta) / lambda -> (12.398/geo_energy)
+            _stl = np.sin(_ttr/2)/(12.398/geo.ener)
+            # d-spacing: l = 2 d sin(t) -> 1/2(sin(t)/l)
+            _dsp = 1/(2*_stl)
+            # prepare the values in the different units / labels
+            _units = {0:np.rad2deg(_ttr), 1:_dsp, 2:_stl*4*np.pi, 3:_stl}
+            self.plo.contours['labels'][_n].setText(f'{_units[geo.unit]:.2f}', color=self.plo.cont_cmap.map(_f, mode='qcolor'))
+
+    def draw_heatmap(self, geo, stages=None):
+        # the heatmap is calculated without energy (sin(theta)), see
+        # ContourEngine.calc_heatmap(), the energy only rescales it
+        # Conversion factor keV to Angstrom: 12.398
+        heat = self.plo.heat_data
+        if self.plo.heat_map == 'None' or heat is None:
+            self.plo.heat_img.setVisible(False)
+            return
+        _lambda = 12.398/geo.ener
+        if self.plo.heat_map == 'q':
+            _img = heat['sin'] * (4*np.pi/_lambda)
+            _lim = [_l * (4*np.pi/_lambda) for _l in heat['sin_lim']]
+        elif self.plo.heat_map == 'd':
+            with np.errstate(divide='ignore'):
+                _img = _lambda / (2*heat['sin'])
+                _lim = [_lambda / (2*_l) for _l in heat['sin_lim'][::-1]]
+        else:
+            _img = heat['omega']
+            _lim = heat['omega_lim']
+        with trace_stage(stages, 'setData'):
+            self.plo.heat_img.setImage(_img, autoLevels=False, levels=_lim)
+        _x0, _x1, _y0, _y1 = heat['rect']
+        self.plo.heat_img.setRect(QtCore.QRectF(_x0, _y0, _x1-_x0, _y1-_y0))
+        self.plo.heat_img.setVisible(True)
+
+    def draw_reference(self, job):
+        # draw the reference contour lines of job
+        # only the rings in job.ref_idx are updated
         # name the window
-        if self.geo.reference == 'None':
+        if not job.geo.reference:
             self.setWindowTitle(self.det.name)
         else:
-            self.setWindowTitle(f'{self.det.name} - {self.geo.reference}')
-        # calculate the offset of the contours resulting from yoff and rotation
-        # shift the grid to draw the cones, to make sure the contours are drawn
-        # within the visible area
-        _comp_shift = -(self.geo.yoff + np.tan(np.deg2rad(self.geo.rota))*self.geo.dist)
-        # increase the the cone grid to allow more
-        # contours to be drawn as the plane is tilted
-        _comp_add = np.tan(np.deg2rad(self.geo.tilt))*self.geo.dist
-        # plot reference contour lines
-        # satndard contour lines are to be drawn
-        for _n,_d in enumerate(self.plo.cont_ref_dsp):
-            # lambda = 2 * d * sin(theta)
-            # 2-theta = 2 * (lambda / 2*d)
-            # lambda -> (12.398/geo_energy)
-            lambda_d = (12.398/self.geo.ener) / (2*_d)
-            if lambda_d > 1.0:
+            self.setWindowTitle(f'{self.det.name} - {", ".join(job.geo.reference)}')
+        # update the reference contour lines
+        # None: out of bounds
+        # a changed number of rings updates all of them, see get_job()
+        if len(self.plo.cont_ref_lines) != len(job.ref_ttr):
+            self.plo.cont_ref_lines = [None] * len(job.ref_ttr)
+        for _n, clines in zip(job.ref_idx, job.ref):
+            self.plo.cont_ref_lines[_n] = clines
+        # one plot item per reference slot, the pool grows on demand
+        while len(self.plo.contours['ref']) <= max(job.ref_slots, default=-1):
+            self.add_reference_item()
+        # the rings of a reference are drawn from one vertex buffer,
+        # the connect mask separates the rings and their segments
+        for _n, ref_item in enumerate(self.plo.contours['ref']):
+            if _n not in job.ref_slots:
+                ref_item.setVisible(False)
                 continue
-            _ttr = 2 * np.arcsin(lambda_d)
-            # calculate ratio of sample to detector distance (sdd)
-            # and contour distance to beam center (cbc)
-            # _rat = sdd/cbc = 1/tan(2-theta)
-            # this is used to scale the cones Z dimension
-            _rat = 1/np.tan(_ttr)
-            # apply the min/max grid resolution
-            _grd_res = max(min(int(self.plo.cont_reso_min*_rat), self.plo.cont_reso_max), self.plo.cont_reso_min)
-            # the grid position needs to adjusted upon change of geometry (y, vertical)
-            # the center needs to be shifted by _geo_offset to make sure all contour lines are drawn
-            _x1 = np.linspace(-self.plo.cont_grid_max + _comp_shift, self.plo.cont_grid_max - _comp_shift + _comp_add, _grd_res)
-            # the grid position needs to adjusted upon change of geometry (x, horizontal)
-            # the center needs to be shifted by geo.xoff to make sure all contour lines are drawn
-            _x2 = np.linspace(-self.plo.cont_grid_max - self.geo.xoff, self.plo.cont_grid_max - self.geo.xoff, _grd_res)
-            # draw contours for the tilted/rotated/moved geometry
-            # use the offset adjusted value x1 to prepare the grid
-            X0, Y0 = np.meshgrid(_x1,_x2)
-            Z0 = np.sqrt(X0**2+Y0**2)*_rat
-            X,Y,Z = self.calc_cone(X0, Y0, Z0, self.geo.rota, self.geo.tilt, self.geo.xoff, self.geo.yoff, self.geo.dist)
-            # make sure Z is large enough to draw the contour
-            if np.max(Z) >= self.geo.dist:
-                clines = contour_generator(x=X, y=Y, z=Z).lines(self.geo.dist)[-1]
-                self.plo.contours['ref'][_n].setData(clines, pen=pg.mkPen(self.plo.cont_ref_color, width=self.plo.cont_ref_lw))
-                self.plo.contours['ref'][_n].setAlpha(self.plo.cont_ref_alpha, False)
-            else:
-                self.plo.contours['ref'][_n].setData([])
-                self.plo.contours['ref'][_n].clear()
-
-    def calc_cone(self, X, Y, Z, rota, tilt, xoff, yoff, dist):
-        # combined rotation, tilt 'movement' is compensated
-        a = np.deg2rad(tilt) + np.deg2rad(rota)
-        # rotate the sample around y
-        t = np.transpose(np.array([X,Y,Z]), (1,2,0))
-        # rotation matrix
-        m = [[np.cos(a), 0, np.sin(a)],[0,1,0],[-np.sin(a), 0, np.cos(a)]]
-        # apply rotation
-        X,Y,Z = np.transpose(np.dot(t, m), (2,0,1))
-        # compensate for tilt not rotating
-        # - revert the travel distance
-        comp = np.deg2rad(tilt) * dist
-        return Y+xoff,X+comp-yoff,Z
+            X, Y, _con = self.get_buffer([_l for _l, _i in zip(self.plo.cont_ref_lines, job.ref_item) if _i == _n], job.stages)
+            with trace_stage(job.stages, 'setData'):
+                ref_item.setData(X, Y, connect=_con)
+            ref_item.setVisible(True)
+        # remember what is drawn
+        self.plo.cont_ref_ttr = job.ref_ttr
+        self.plo.cont_ref_item = job.ref_item
+
+    def add_reference_item(self):
+        # plot item of the next reference slot, the first one is drawn
+        # in plo.cont_ref_color, the others cycle plo.cont_ref_colors
+        _n = len(self.plo.contours['ref'])
+        _color = self.plo.cont_ref_color if _n == 0 else self.plo.cont_ref_colors[(_n-1) % len(self.plo.cont_ref_colors)]
+        ref_item = self.ax.plot(useCache=True, pxMode=True)
+        ref_item.setPen(pg.mkPen(_color, width=self.plo.cont_ref_lw))
+        ref_item.setAlpha(self.plo.cont_ref_alpha, False)
+        self.plo.contours['ref'].append(ref_item)
+
+    def get_buffer(self, clines, stages=None):
+        # vertex buffer and connect mask of the contour lines, see join_lines()
+        # decimated to plo.cont_decimate screen pixels of the current view,
+        # a view change redraws the contours
+        X, Y, _con = join_lines(clines)
+        self.vertices[0] += len(X)
+        if self.plo.cont_decimate > 0:
+            _tol = np.array(self.ax.getViewBox().viewPixelSize()) * self.plo.cont_decimate
+            with trace_stage(stages, 'decimate'):
+                X, Y, _con = decimate_lines(X, Y, _con, _tol)
+        self.vertices[1] += len(X)
+        return X, Y, _con
+
+    def invalidate(self, *pars):
+        # mark all artifacts depending on pars as outdated
+        for _art, _deps in self.depends.items():
+            if set(pars).intersection(_deps):
+                self.invalid.add(_art)
+
+    def get_job(self):
+        # snapshot of everything needed to calculate the outdated
+        # artifacts, the calculation might run in the worker thread
+        # while the sliders keep changing self.geo
+        # results of superseded jobs were never drawn
+        covered = self.invalid | self.unapplied
+        self.unapplied = covered
+        self.invalid = set()
+        # contours outside of the visible detector area are skipped
+        # rectangles: (x0, x1, y0, y1)
+        (_vx0, _vx1), (_vy0, _vy1) = self.ax.getViewBox().viewRange()
+        view = (max(_vx0, -self.plo.xdim), min(_vx1, self.plo.xdim), max(_vy0, -self.plo.ydim), min(_vy1, self.plo.ydim))
+        # geometry contour levels
+        exp_ttr = np.deg2rad(self.plo.cont_levels) if 'exp_shape' in covered else None
+        ref_ttr, ref_item = self.get_ref_ttr(self.geo.ener, self.geo.dist)
+        job = self.engine.get_job(self.geo, exp_ttr, ref_ttr, view, pixel=self.ax.getViewBox().viewPixelSize())
+        job.ref_item = ref_item
+        job.ref_slots = set(self.ref_slots.values())
+        job.covered = covered
+        # the heatmap is only recalculated for a new geometry
+        if 'heat_geo' in covered and self.plo.heat_map != 'None':
+            job.heat_step = self.plo.heat_px
+        if 'ref_shape' in job.covered:
+            # the geometry changed, update all rings
+            job.ref_idx = np.arange(len(job.ref_ttr))
+        elif 'ref_tth' in job.covered and len(job.ref_ttr) == len(self.plo.cont_ref_ttr):
+            # update the rings whose 2-theta or reference slot changed
+            _same = (job.ref_ttr == self.plo.cont_ref_ttr) & (job.ref_item == self.plo.cont_ref_item)
+            job.ref_idx = np.flatnonzero(~_same)
+        elif 'ref_tth' in job.covered:
+            # rings appeared, vanished or merged
+            job.ref_idx = np.arange(len(job.ref_ttr))
+        else:
+            job.ref_idx = np.arange(0)
+        return job
+
+    def get_ref_ttr(self, ener, dist):
+        # reference contour levels and their reference slot
+        # the d spacings of all references are converted at once,
+        # rings closer than plo.cont_ref_merge pixels (at the beam
+        # center) are merged, unreachable rings are dropped
+        _ttr = self.ref_store.calc_tth(self.plo.cont_ref_dsp, ener)
+        return merge_rings(_ttr, self.plo.cont_ref_dsp_item, self.plo.cont_ref_merge * self.det.pxs / dist)
+
+    def get_prefetch(self, job):
+        # jobs for plo.cont_prefetch positions on either side of the
+        # dragged slider, nearest first, with the levels of job
+        # the worker calculates them when idle, the lines end up in
+        # the engine cache and the next slider tick is a cache hit
+        _par = self.drag_par
+        if _par is None or self.plo.cont_prefetch <= 0:
+            return []
+        _min, _max, _stp = [getattr(self.lmt, f'{_par}_{_s}') for _s in ('min', 'max', 'stp')]
+        _val = getattr(job.geo, _par)
+        jobs = []
+        for _k in range(1, self.plo.cont_prefetch + 1):
+            for _v in (_val + _k*_stp, _val - _k*_stp):
+                if not _min <= _v <= _max:
+                    continue
+                _job = self.engine.get_job(job.geo, job.exp_ttr, job.ref_ttr, job.view, job.scale, job.pixel)
+                setattr(_job.geo, _par, float(_v))
+                # energy and distance move or merge the reference rings
+                if _par in ('ener', 'dist'):
+                    _job.ref_ttr, _ = self.get_ref_ttr(_job.geo.ener, _job.geo.dist)
+                    _job.ref_idx = np.arange(len(_job.ref_ttr))
+                jobs.append(_job)
+        return jobs
+
+    def submit_job(self, job):
+        # calculate the job in the worker thread,
+        # apply_job() draws the result, older jobs are superseded
+        self.job_id += 1
+        self.worker.latest = self.job_id
+        self.sig_job.emit(self.job_id, job)
+
+    def cancel_jobs(self):
+        # results of pending jobs are dropped
+        self.job_id += 1
+        self.worker.latest = self.job_id
+
+    def apply_job(self, job_id, job):
+        # drop results of superseded jobs
+        if job_id != self.job_id:
+            return
+        # draw what the job covers
+        # vertices handed to the plot before/after decimation
+        self.vertices = [0, 0]
+        if 'beam_center' in job.covered:
+            self.draw_beam_center(job.geo)
+        if job.exp is not None:
+            self.draw_contours(job)
+        if 'exp_label' in job.covered:
+            self.draw_labels(job.geo)
+        if 'ref_tth' in job.covered or 'ref_shape' in job.covered:
+            self.draw_reference(job)
+        if 'heat_geo' in job.covered:
+            self.plo.heat_data = job.heat
+        if 'heat_geo' in job.covered or 'heat_ener' in job.covered:
+            self.draw_heatmap(job.geo, job.stages)
+        self.unapplied = set()
+        # level of detail of the drawn contours
+        if job.covered.intersection(('exp_shape', 'ref_tth', 'ref_shape')):
+            self.lod_drawn = job.scale
+        # adjust the preview resolution to the time budget
+        # the costs scale between linear (conic) and squared (grid)
+        # with the resolution
+        if job.preview and job.calc_time > 0:
+            _adj = np.sqrt(self.plo.render_budget / job.calc_time)
+            # in steps of 0.05, revisited geometries hit the contour cache
+            self.lod_scale = float(np.clip(np.round(job.scale * _adj * 20) / 20, 0.1, 1.0))
+        # report the savings of the final frames
+        if self.plo.render_stats and not job.preview and self.vertices[0] > 0:
+            print(f'Vertices: {self.vertices[0]} calculated, {self.vertices[1]} drawn ({self.plo.cont_decimate} px)')
+        if self.trace is not None and job.stages is not None:
+            # a frame that was never painted is kept without paint time
+            if self.trace_frame is not None:
+                self.trace.add(self.trace_frame)
+            self.trace_frame = {'time':round(time.perf_counter() - t_start, 3), 'frame':job_id, 'preview':job.preview,
+                                'scale':round(job.scale, 3), 'calc':job.calc_time, 'vertices':self.vertices[0],
+                                'drawn':self.vertices[1], 'culled':job.culled, 'cached':job.cached, 'covered':sorted(job.covered), **job.stages}
+
+    def trace_paint(self, paint_time):
+        # the latest frame is painted, add it to the trace and show it
+        # repaints without a new frame are not traced
+        frame = self.trace_frame
+        if frame is None:
+            return
+        self.trace_frame = None
+        frame['paint'] = paint_time
+        self.trace.add(frame)
+        if self.plo.trace_overlay:
+            _stages = '\n'.join(f'{_s:<10}{frame[_s]:8.1f} ms' for _s in trace_stages if _s in frame)
+            self.trace_label.setText(f'{"calc":<10}{frame["calc"]:8.1f} ms\n{_stages}\n'
+                                     f'{"vertices":<10}{frame["drawn"]:8d}\n{"culled":<10}{frame["culled"]:8d}')
+            self.trace_label.adjustSize()
+            self.trace_label.move(4, self.ax.height() - self.trace_label.height() - 4)
 
     def update_screen(self, val):
         if self.sender().objectName() == 'dist':
@@ -654,12 +938,75 @@ class MainWindow(pg.QtWidgets.QMainWindow):
             self.geo.xoff = float(val)
         elif self.sender().objectName() == 'ener':
             self.geo.ener = float(val)
+        self.invalidate(self.sender().objectName())
+        # only the latest geometry is drawn
+        self.scheduler.request()
+
+    def render_screen(self, sync=False, scale=None):
         # re-calculate cones and re-draw contours
-        self.draw_contours()
-        # draw reference contours
-        if self.geo.reference != 'None':
-            self.get_reference()
-            self.draw_reference()
+        # only what is outdated, see invalidate()
+        # - sync: calculate in the GUI thread at the set resolution
+        # - scale: contour resolution factor, if not given the
+        #          preview resolution is used and refined when idle
+        _stages = dict() if self.plo.trace else None
+        if 'ref_dsp' in self.invalid:
+            with trace_stage(_stages, 'reference'):
+                self.get_reference()
+        job = self.get_job()
+        if job.stages is not None:
+            job.stages.update(_stages)
+        job.preview = scale is None and not sync
+        if scale is not None:
+            job.scale = scale
+        elif sync:
+            job.scale = 1.0
+        else:
+            job.scale = self.lod_scale
+        if scale is None:
+            self.lod_timer.start()
+        if self.plo.render_thread and not sync:
+            # calculate in the worker thread, see apply_job()
+            job.prefetch = self.get_prefetch(job)
+            self.submit_job(job)
+        else:
+            # supersede pending jobs of the worker thread
+            self.cancel_jobs()
+            self.apply_job(self.job_id, self.engine.calc_job(job))
+
+    def refine_screen(self):
+        # input stopped, recalculate at the refined resolution
+        self.lod_timer.stop()
+        if self.lod_drawn >= self.plo.render_refine:
+            return
+        self.invalidate('lod')
+        self.render_screen(scale=self.plo.render_refine)
+
+    def press_slider(self):
+        # a slider handle is dragged, keys, wheel and set_geometry()
+        # move the sliders without prefetch
+        self.drag_par = self.sender().objectName()
+
+    def release_slider(self):
+        # draw the final geometry and refine right away
+        self.drag_par = None
+        self.scheduler.flush()
+        self.refine_screen()
+
+    def closeEvent(self, event):
+        # stop the worker thread
+        self.lod_timer.stop()
+        self.view_timer.stop()
+        self.cancel_jobs()
+        if self.trace is not None:
+            if self.trace_frame is not None:
+                self.trace.add(self.trace_frame)
+            self.trace.save()
+        self.worker_thread.quit()
+        self.worker_thread.wait()
+        # a running sweep is finished first
+        self.sweep_thread.quit()
+        self.sweep_thread.wait()
+        super().closeEvent(event)
 
     def dragEnterEvent(self, event):
         # Drag-and-Drop cif-file
@@ -680,18 +1027,23 @@ class MainWindow(pg.QtWidgets.QMainWindow):
         # fetch the geometry, detector, plot specifications and limits
         # load the defaults
         # geo: geometry and detector specs
-        self.geo = self.get_specs_geo()
+        self.geo = get_specs_geo()
         # plo: plot details
-        self.plo = self.get_specs_plo()
+        self.plo = get_specs_plo()
         # lmt: geometry limits
-        self.lmt = self.get_specs_lmt()
+        self.lmt = get_specs_lmt()
         # file name to store current settings
         # if file_dump doesn't exists, make a dump
+        # read only (force_write=False): keep the defaults
         if not os.path.exists(file_dump) or save_default:
-            self.save_par(file_dump)
+            if force_write or save_default:
+                self.save_par(file_dump)
         # if it exists load parameters
         else:
             self.load_par(file_dump)
+        # references: a list of names, older settings hold one name
+        if isinstance(self.geo.reference, str):
+            self.geo.reference = [] if self.geo.reference == 'None' else [self.geo.reference]
         
         if force_write:
             self.save_par(file_dump)
@@ -702,16 +1054,197 @@ class MainWindow(pg.QtWidgets.QMainWindow):
             json.dump({'geo':self.geo.__dict__, 'plo':self.plo.__dict__, 'lmt':self.lmt.__dict__}, wf, indent=4)
 
     def load_par(self, save_as):
-        # Opening JSON file as dict
-        with open(save_as, 'r') as of:
-            pars = json.load(of)
-        conv = {'geo':self.geo, 'plo':self.plo, 'lmt':self.lmt}
-        for key, vals in pars.items():
-                for p, x in vals.items():
-                    setattr(conv[key], p, x)
+        # Opening JSON file, see detgeo_core.load_par()
+        load_par(save_as, self.geo, self.plo, self.lmt)
+
+class RenderScheduler(QtCore.QObject):
+    # coalesce render requests (e.g. slider ticks)
+    # - only the latest state is rendered, intermediate requests are dropped
+    # - renders are capped at fps
+    # - flush() renders immediately (e.g. on slider release)
+    def __init__(self, parent, render, fps, verbose=False):
+        super().__init__(parent)
+        self.render = render
+        self.verbose = verbose
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(int(1000/fps) if fps > 0 else 0)
+        self.timer.timeout.connect(self.run)
+        self.pending = False
+        self.num_requested = 0
+        self.num_rendered = 0
+
+    def request(self):
+        self.num_requested += 1
+        self.pending = True
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def run(self):
+        if not self.pending:
+            return
+        self.pending = False
+        self.num_rendered += 1
+        self.render()
+
+    def flush(self):
+        # render the latest state now and report
+        self.timer.stop()
+        self.run()
+        if self.verbose:
+            print(f'Render: {self.num_requested} requested, {self.num_rendered} drawn, {self.skipped()} skipped')
+        self.num_requested = 0
+        self.num_rendered = 0
+
+    def skipped(self):
+        return self.num_requested - self.num_rendered
+
+class PaintTimer(QtCore.QObject):
+    # time the paint events of a widget, report(ms) after each one
+    # the event is painted from within the filter and not passed on
+    def __init__(self, widget, report):
+        super().__init__(widget)
+        self.report = report
+        self.busy = False
+        widget.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if self.busy or event.type() != QtCore.QEvent.Type.Paint:
+            return False
+        self.busy = True
+        _t0 = time.perf_counter()
+        try:
+            QtCore.QCoreApplication.sendEvent(obj, event)
+        finally:
+            self.busy = False
+        self.report((time.perf_counter() - _t0) * 1e3)
+        return True
+
+class ContourWorker(QtCore.QObject):
+    # calculates contour jobs in a background thread
+    # - jobs that are superseded before they start are skipped
+    # - running jobs are cancelled as soon as a newer one arrives
+    # - until then, the prefetch jobs of the latest job are calculated
+    finished = QtCore.pyqtSignal(int, object)
+
+    def __init__(self, calc):
+        super().__init__()
+        self.calc = calc
+        # id of the latest job, set from the GUI thread
+        self.latest = 0
+
+    @QtCore.pyqtSlot(int, object)
+    def run(self, job_id, job):
+        if job_id != self.latest:
+            return
+        job = self.calc(job, cancelled=lambda: job_id != self.latest)
+        if job is None:
+            return
+        self.finished.emit(job_id, job)
+        for _job in job.prefetch:
+            if job_id != self.latest:
+                break
+            self.calc(_job, cancelled=lambda: job_id != self.latest)
+
+class SweepWorker(QtCore.QObject):
+    # calculates coverage maps (calc_sweep()) in a background thread
+    # the worker processes are waited for here, not in the GUI thread
+    # - finished: result (None if failed) and error message
+    finished = QtCore.pyqtSignal(object, str)
+
+    @QtCore.pyqtSlot(object)
+    def run(self, args):
+        from concurrent.futures.process import BrokenProcessPool
+        try:
+            res = calc_sweep(*args)
+        except (OSError, BrokenProcessPool, ValueError) as e:
+            self.finished.emit(None, f'{type(e).__name__}: {e}')
+            return
+        self.finished.emit(res, '')
+
+class CoverageWindow(QtWidgets.QMainWindow):
+    # heatmap of a calc_sweep() result
+    # - pick the quantity to display
+    # - double click: use the geometry in the main window
+    # - export: .npz (everything) or .csv (per point)
+    def __init__(self, parent, res):
+        super().__init__(parent)
+        self.res = res
+        self.axes = [str(_p) for _p in res['axes']]
+        self.quantities = {'d min, complete ring [\u212B]':'dsp_full',
+                           'd min, on modules [\u212B]':'dsp_part'}
+        self.setWindowTitle(f'{parent.det.name} - Coverage')
+        widget = QtWidgets.QWidget()
+        layout = QtWidgets.QVBoxLayout(widget)
+        self.setCentralWidget(widget)
+        bar = QtWidgets.QHBoxLayout()
+        layout.addLayout(bar)
+        self.box = QtWidgets.QComboBox()
+        self.box.addItems(list(self.quantities))
+        self.box.currentTextChanged.connect(self.draw)
+        bar.addWidget(self.box)
+        button = QtWidgets.QPushButton('Export')
+        button.clicked.connect(self.export)
+        bar.addWidget(button)
+
+        self.ax = pg.PlotWidget()
+        layout.addWidget(self.ax)
+        self.ax.setLabel('bottom', parent.par_names[self.axes[0]])
+        self.ax.setLabel('left', parent.par_names[self.axes[1]])
+        self.img = pg.ImageItem()
+        self.ax.addItem(self.img)
+        # the pixels are centered on the grid values
+        _x, _y = res[self.axes[0]], res[self.axes[1]]
+        _dx = (_x[-1]-_x[0])/max(len(_x)-1, 1)
+        _dy = (_y[-1]-_y[0])/max(len(_y)-1, 1)
+        self.rect = QtCore.QRectF(_x[0]-_dx/2, _y[0]-_dy/2, _dx*len(_x), _dy*len(_y))
+        self.cbar = pg.ColorBarItem(colorMap=parent.plo.cont_cmap, interactive=False)
+        self.cbar.setImageItem(self.img, insert_in=self.ax.getPlotItem())
+        self.ax.scene().sigMouseMoved.connect(self.show_value)
+        self.ax.scene().sigMouseClicked.connect(self.pick_geometry)
+        self.statusBar()
+        self.draw()
+        self.resize(parent.plo.plot_size, parent.plo.plot_size)
+
+    def draw(self):
+        _data = self.res[self.quantities[self.box.currentText()]]
+        self.img.setImage(_data)
+        self.img.setRect(self.rect)
+        _fin = _data[np.isfinite(_data)]
+        if len(_fin) > 0:
+            self.cbar.setLevels((np.min(_fin), np.max(_fin)))
+
+    def get_index(self, scene_pos):
+        # grid index at the scene position, None if outside
+        _pos = self.ax.getViewBox().mapSceneToView(scene_pos)
+        _x, _y = self.res[self.axes[0]], self.res[self.axes[1]]
+        _i = int(np.argmin(np.abs(_x - _pos.x())))
+        _j = int(np.argmin(np.abs(_y - _pos.y())))
+        if not self.img.sceneBoundingRect().contains(scene_pos):
+            return None
+        return _i, _j
+
+    def show_value(self, scene_pos):
+        _idx = self.get_index(scene_pos)
+        if _idx is None:
+            return
+        _i, _j = _idx
+        _x, _y = self.res[self.axes[0]][_i], self.res[self.axes[1]][_j]
+        _val = self.res[self.quantities[self.box.currentText()]][_i,_j]
+        self.statusBar().showMessage(f'{self.axes[0]}: {_x:.2f}, {self.axes[1]}: {_y:.2f}, {self.box.currentText()}: {_val:.3f}')
+
+    def pick_geometry(self, event):
+        if not event.double():
+            return
+        _idx = self.get_index(event.scenePos())
+        if _idx is None:
+            return
+        self.parent().set_geometry({_p:self.res[_p][_n] for _p, _n in zip(self.axes, _idx)})
 
-class container(object):
-    pass
+    def export(self):
+        save_as, _ = QtWidgets.QFileDialog.getSaveFileName(self, 'Export coverage', 'coverage.npz', 'NumPy (*.npz);;CSV (*.csv)')
+        if save_as:
+            save_sweep(save_as, self.res)
 
 class SliderWidget(QtWidgets.QFrame):
     def __init__(self, parent, geo, plo, lmt):
@@ -794,6 +1327,8 @@ class SliderWidget(QtWidgets.QFrame):
         slider = QtWidgets.QSlider(QtCore.Qt.Orientation.Vertical, objectName=token)
         slider.setValue(999)
         slider.valueChanged.connect(self.parent().update_screen)
+        slider.sliderPressed.connect(self.parent().press_slider)
+        slider.sliderReleased.connect(self.parent().release_slider)
         slider.valueChanged.connect(lambda value: self.update_slider(label_value, value))
         slider.setRange(int(lmin), int(lmax))
         slider.setSingleStep(int(lstp))
@@ -863,6 +1398,10 @@ def main():
     app = QtWidgets.QApplication(sys.argv)
     main = MainWindow()
     main.show()
+    if main.plo.startup_stats:
+        # first paint
+        app.processEvents()
+        main.report_startup()
     sys.exit(app.exec())
     
 if __name__ == '__main__':
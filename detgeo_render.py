@@ -0,0 +1,168 @@
+import os, sys, time, shutil, argparse, subprocess, multiprocessing, multiprocessing.util
+import numpy as np
+from detgeo_core import get_specs_geo, get_specs_plo, get_specs_lmt, load_par, get_det_library, get_batch, read_batch, batch_pars
+
+###########################################################
+# Render geometry sequences to images, without GUI
+# - the main window is drawn offscreen (Qt offscreen platform)
+# - geometries from a parameter file or a linear scan:
+#   python detgeo_render.py pars.csv -o frames
+#   python detgeo_render.py --scan ener 10 30 --scan dist 80 150 -n 120 -o scan.mp4
+# - frames are rendered by a pool of worker processes, each
+#   one holds its own window, the frames are written in order
+#   to PNG files or piped to ffmpeg (.mp4, .webm, .gif, ...)
+###########################################################
+
+video_types = ('.mp4', '.mkv', '.mov', '.avi', '.webm', '.gif')
+
+# one offscreen window per worker process, see init_worker()
+_app = None
+_win = None
+
+def init_worker(settings):
+    # offscreen main window with the render settings (container)
+    # the window does not write settings.json
+    global _app, _win
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    # workers must not write the same trace file
+    os.environ.pop('DETGEO_TRACE', None)
+    import pyqtgraph as pg
+    from PyQt6 import QtWidgets
+    from detgeo_pyqt6 import MainWindow
+    pg.setConfigOptions(background='w', antialias=True)
+    _app = QtWidgets.QApplication(sys.argv[:1])
+    _win = MainWindow(write_settings=False)
+    # everything is drawn in this thread at the refined resolution
+    _win.plo.render_thread = False
+    _win.plo.trace = False
+    _win.lod_timer.timeout.disconnect()
+    _win.view_timer.timeout.disconnect()
+    if settings.det is not None:
+        _win.change_detector(*settings.det)
+    if settings.reference is not None:
+        _win.set_references(settings.reference)
+    if settings.unit is not None:
+        _win.change_units(settings.unit)
+    if settings.heatmap is not None:
+        _win.change_heatmap(settings.heatmap)
+    _win.show()
+    _win.sliderWidget.hide()
+    _app.processEvents()
+    # pool processes skip atexit, stop the contour thread on exit
+    if multiprocessing.parent_process() is not None:
+        multiprocessing.util.Finalize(_win, _win.close, exitpriority=10)
+
+def render_frame(task):
+    # draw the geometry pars (batch_pars) and grab the plot
+    # - save_as: PNG file, returns its name
+    #            None: returns the PNG encoded frame (bytes)
+    from PyQt6 import QtCore
+    pars, save_as = task
+    for _p, _v in zip(batch_pars, pars):
+        if getattr(_win.geo, _p) != _v:
+            setattr(_win.geo, _p, float(_v))
+            _win.invalidate(_p)
+    _win.render_screen(sync=True, scale=_win.plo.render_refine)
+    _app.processEvents()
+    frame = _win.ax.grab()
+    if save_as is not None:
+        frame.save(save_as, 'PNG')
+        return save_as
+    _buf = QtCore.QBuffer()
+    _buf.open(QtCore.QIODevice.OpenModeFlag.WriteOnly)
+    frame.save(_buf, 'PNG')
+    return bytes(_buf.data())
+
+def render_frames(tasks, settings, workers=0):
+    # generator of render_frame() results, in order of tasks
+    # pool of workers (processes), workers=0: number of CPUs
+    workers = workers if workers > 0 else (os.cpu_count() or 1)
+    workers = min(workers, len(tasks))
+    if workers == 1:
+        init_worker(settings)
+        for _t in tasks:
+            yield render_frame(_t)
+        _win.close()
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    # spawn: fresh processes, no Qt state is inherited
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=init_worker, initargs=(settings,)) as pool:
+        # small chunks keep the order without holding many frames
+        yield from pool.map(render_frame, tasks, chunksize=max(1, min(8, len(tasks)//(workers*4))))
+
+def get_ffmpeg(save_as, fps):
+    # ffmpeg reading PNG frames from stdin
+    _ffmpeg = shutil.which('ffmpeg')
+    if _ffmpeg is None:
+        sys.exit('ffmpeg not found, write PNG frames to a directory instead, e.g. -o frames')
+    cmd = [_ffmpeg, '-y', '-loglevel', 'error', '-f', 'image2pipe', '-framerate', str(fps), '-c:v', 'png', '-i', '-']
+    if os.path.splitext(save_as)[1].lower() in ('.mp4', '.mkv', '.mov', '.avi'):
+        # most players need yuv420p, i.e. even width and height
+        cmd += ['-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-pix_fmt', 'yuv420p']
+    return subprocess.Popen(cmd + [save_as], stdin=subprocess.PIPE)
+
+def get_scan(scan, num, geo):
+    # linear scan, all parameters (PAR, START, STOP) move together
+    return get_batch({_p:np.linspace(float(_a), float(_b), num) for _p, _a, _b in scan}, geo)
+
+def main():
+    parser = argparse.ArgumentParser(description='Render geometry sequences to PNG frames or a video (headless).')
+    parser.add_argument('pars', nargs='?', help='parameter file (.json, .csv, .txt), parameters: ' + ', '.join(batch_pars))
+    parser.add_argument('-o', '--out', default='frames', help='output directory (PNG frames) or video file: ' + ', '.join(video_types))
+    parser.add_argument('--scan', nargs=3, action='append', default=None, metavar=('PAR', 'START', 'STOP'), help='linear scan of PAR, repeat to scan several at once, e.g. --scan ener 10 30')
+    parser.add_argument('-n', '--num', type=int, default=100, help='frames of the scan')
+    parser.add_argument('--fps', type=float, default=25, help='frames per second of the video')
+    parser.add_argument('--prefix', default='frame', help='PNG frame name: <prefix>_00000.png')
+    parser.add_argument('-w', '--workers', type=int, default=0, help='worker processes, default: number of CPUs')
+    parser.add_argument('-d', '--det', nargs=2, default=None, metavar=('TYPE', 'SIZE'), help='detector, e.g. EIGER2 4M, default: settings.json')
+    parser.add_argument('--reference', nargs='*', default=None, metavar='REF', help='pyFAI or cif references, e.g. LaB6 CeO2, default: settings.json')
+    parser.add_argument('--unit', type=int, default=None, help='unit index of the contour labels, default: settings.json')
+    parser.add_argument('--heatmap', default=None, choices=('None', 'd', 'q', 'omega'), help='heatmap on the modules, default: settings.json')
+    args = parser.parse_args()
+
+    # geometries not given are taken from settings.json
+    _path = os.path.dirname(os.path.abspath(__file__))
+    geo, plo, lmt = get_specs_geo(), get_specs_plo(), get_specs_lmt()
+    if os.path.exists(os.path.join(_path, 'settings.json')):
+        load_par(os.path.join(_path, 'settings.json'), geo, plo, lmt)
+    if args.scan is not None:
+        _bad = [_s[0] for _s in args.scan if _s[0] not in batch_pars]
+        if _bad:
+            parser.error(f'unknown scan parameter {", ".join(_bad)}, choose from: {", ".join(batch_pars)}')
+        pars = get_scan(args.scan, args.num, geo)
+    elif args.pars is not None:
+        pars = read_batch(args.pars, geo)
+    else:
+        parser.error('a parameter file or --scan is needed')
+    # the windows only read the detector library, make sure it exists
+    # before the workers start
+    _lib = get_det_library(_path)
+    if args.det is not None and (args.det[0] not in _lib or args.det[1] not in _lib[args.det[0]]['size']):
+        parser.error(f'unknown detector {" ".join(args.det)}')
+    settings = argparse.Namespace(det=args.det, reference=args.reference, unit=args.unit, heatmap=args.heatmap)
+
+    video = os.path.splitext(args.out)[1].lower() in video_types
+    if video:
+        ffmpeg = get_ffmpeg(args.out, args.fps)
+        tasks = [(_p, None) for _p in pars]
+    else:
+        os.makedirs(args.out, exist_ok=True)
+        tasks = [(_p, os.path.join(args.out, f'{args.prefix}_{_i:05d}.png')) for _i, _p in enumerate(pars)]
+
+    _t0 = time.perf_counter()
+    try:
+        for _i, _res in enumerate(render_frames(tasks, settings, args.workers)):
+            if video:
+                ffmpeg.stdin.write(_res)
+            if (_i + 1) % max(1, len(tasks)//10) == 0 or _i + 1 == len(tasks):
+                print(f'Rendered {_i+1}/{len(tasks)} frames ({time.perf_counter() - _t0:.1f} s)', file=sys.stderr)
+    finally:
+        if video:
+            ffmpeg.stdin.close()
+            ffmpeg.wait()
+    if video and ffmpeg.returncode != 0:
+        sys.exit(f'ffmpeg failed ({ffmpeg.returncode}), {args.out} is incomplete')
+
+if __name__ == '__main__':
+    main()